@@ -0,0 +1,269 @@
+from bisect import bisect_left
+import struct
+
+# Buffer layout: header | free-list heads (64 orders) | tag byte per minimum block | data
+MAGIC = b'MMARENA1'
+_HEADER = struct.Struct('<8sQQQQQQQ')  # magic, heads_off, tags_off, data_base, data_size, min_order, max_order, allocated
+_OFFSET = struct.Struct('<q')
+_NONE = -1
+_FREE = 0x80
+_ORDER_MASK = 0x3F
+_ZEROS = bytes(64 * 1024)
+_ALIGN = 4096
+
+
+class Arena:
+    """
+    Buddy allocator that carves blocks out of one preallocated buffer.
+
+    Blocks are powers of two between ``min_block`` and the arena size. Each order has an
+    intrusive doubly linked free list stored in the free blocks themselves, so allocation is
+    a pop (plus at most one split per order), release coalesces with free buddies and
+    growth merges with free upper buddies in place before falling back to a move.
+
+    All metadata lives inside ``buffer``, so the same arena works over a bytearray, an mmap
+    or a shared-memory segment, and ``initialize=False`` reopens an existing one.
+    """
+
+    def __init__(self, buffer, min_block=64, initialize=True):
+        self.buffer = buffer
+        self.mem = memoryview(buffer)
+        if initialize:
+            self._format(min_block)
+        self._load()
+
+    def _format(self, min_block):
+        if min_block < 16 or min_block & (min_block - 1):
+            raise ValueError("min_block must be a power of two >= 16")
+        min_order = min_block.bit_length() - 1
+        total = len(self.mem)
+        heads_off = _HEADER.size
+        tags_off = heads_off + 64 * _OFFSET.size
+        # Largest data region (a multiple of min_block) that fits after its own tag map
+        data_size = (total - tags_off) * min_block // (min_block + 1) // min_block * min_block
+        while data_size > 0 and _align(tags_off + (data_size >> min_order), _ALIGN) + data_size > total:
+            data_size -= max(min_block, _ALIGN // 2)
+            data_size -= data_size % min_block
+        if data_size < min_block:
+            raise ValueError(f"Buffer of {total} bytes is too small for an arena")
+        data_base = _align(tags_off + (data_size >> min_order), _ALIGN)
+        max_order = data_size.bit_length() - 1
+
+        _HEADER.pack_into(self.mem, 0, MAGIC, heads_off, tags_off, data_base, data_size, min_order, max_order, 0)
+        for order in range(64):
+            _OFFSET.pack_into(self.mem, heads_off + order * _OFFSET.size, _NONE)
+        self._zero(tags_off, data_size >> min_order)
+        self._load()
+        # A region that is not a power of two is seeded as one free block per set bit, largest first
+        relative = 0
+        for order in range(max_order, min_order - 1, -1):
+            if data_size & (1 << order):
+                self._push(data_base + relative, order)
+                relative += 1 << order
+
+    def _load(self):
+        magic, self.heads_off, self.tags_off, self.data_base, self.data_size, \
+            self.min_order, self.max_order, _ = _HEADER.unpack_from(self.mem, 0)
+        if magic != MAGIC:
+            raise ValueError("Buffer does not contain an arena")
+
+    # Metadata helpers
+    def _zero(self, offset, nbytes):
+        end = offset + nbytes
+        while offset < end:
+            n = min(len(_ZEROS), end - offset)
+            self.mem[offset:offset + n] = _ZEROS[:n]
+            offset += n
+
+    def _tag_index(self, offset):
+        return self.tags_off + ((offset - self.data_base) >> self.min_order)
+
+    def _tag(self, offset):
+        return self.mem[self._tag_index(offset)]
+
+    def _set_tag(self, offset, value):
+        self.mem[self._tag_index(offset)] = value
+
+    def _head(self, order):
+        return _OFFSET.unpack_from(self.mem, self.heads_off + order * _OFFSET.size)[0]
+
+    def _set_head(self, order, offset):
+        _OFFSET.pack_into(self.mem, self.heads_off + order * _OFFSET.size, offset)
+
+    def _allocated(self):
+        return _OFFSET.unpack_from(self.mem, _HEADER.size - _OFFSET.size)[0]
+
+    def _add_allocated(self, delta):
+        _OFFSET.pack_into(self.mem, _HEADER.size - _OFFSET.size, self._allocated() + delta)
+
+    def _push(self, offset, order):
+        head = self._head(order)
+        _OFFSET.pack_into(self.mem, offset, _NONE)
+        _OFFSET.pack_into(self.mem, offset + 8, head)
+        if head != _NONE:
+            _OFFSET.pack_into(self.mem, head, offset)
+        self._set_head(order, offset)
+        self._set_tag(offset, _FREE | order)
+
+    def _remove(self, offset, order):
+        prev = _OFFSET.unpack_from(self.mem, offset)[0]
+        nxt = _OFFSET.unpack_from(self.mem, offset + 8)[0]
+        if prev == _NONE:
+            self._set_head(order, nxt)
+        else:
+            _OFFSET.pack_into(self.mem, prev + 8, nxt)
+        if nxt != _NONE:
+            _OFFSET.pack_into(self.mem, nxt, prev)
+
+    def _order_for(self, nbytes):
+        order = max(self.min_order, (max(nbytes, 1) - 1).bit_length())
+        if order > self.max_order:
+            raise MemoryError(f"Allocation of {nbytes} bytes exceeds the arena size {self.data_size}")
+        return order
+
+    def _free_buddy(self, offset, order):
+        # The buddy's offset if it is a free block of the same order, otherwise None
+        buddy = self.data_base + ((offset - self.data_base) ^ (1 << order))
+        if buddy + (1 << order) > self.data_base + self.data_size or self._tag(buddy) != _FREE | order:
+            return None
+        return buddy
+
+    # Public API
+    def allocate(self, nbytes, zero=True):
+        order = self._order_for(nbytes)
+        current = order
+        while current <= self.max_order and self._head(current) == _NONE:
+            current += 1
+        if current > self.max_order:
+            raise MemoryError(f"Arena has no free block of {1 << order} bytes")
+        offset = self._head(current)
+        self._remove(offset, current)
+        while current > order:
+            current -= 1
+            self._push(offset + (1 << current), current)
+        self._set_tag(offset, order)
+        self._add_allocated(1 << order)
+        if zero:
+            self._zero(offset, nbytes)
+        return offset
+
+    def rebuild(self, blocks):
+        # Resets the free lists so exactly the given (offset, nbytes) blocks are allocated. Used to
+        # reopen an arena from an external index: only free blocks are written, so data is untouched.
+        allocated = sorted((offset, self._order_for(nbytes)) for offset, nbytes in blocks)
+        starts = [offset for offset, _ in allocated]
+        for offset, order in allocated:
+            if offset < self.data_base or (offset - self.data_base) % (1 << order):
+                raise ValueError(f"Offset {offset} is not a block boundary")
+        for order in range(64):
+            self._set_head(order, _NONE)
+        self._zero(self.tags_off, self.data_size >> self.min_order)
+
+        total = 0
+        pending = []
+        relative = 0
+        for order in range(self.max_order, self.min_order - 1, -1):
+            if self.data_size & (1 << order):
+                pending.append((self.data_base + relative, order))
+                relative += 1 << order
+        while pending:
+            start, order = pending.pop()
+            end = start + (1 << order)
+            i = bisect_left(starts, start)
+            if i == len(starts) or starts[i] >= end:
+                self._push(start, order)
+            elif starts[i] == start and allocated[i][1] == order:
+                if i + 1 < len(starts) and starts[i + 1] < end:
+                    raise ValueError(f"Block at {starts[i + 1]} overlaps the block at {start}")
+                self._set_tag(start, order)
+                total += 1 << order
+            elif starts[i] == start and allocated[i][1] > order:
+                raise ValueError(f"Block at {start} does not fit the arena layout")
+            else:
+                half = 1 << (order - 1)
+                pending.append((start + half, order - 1))
+                pending.append((start, order - 1))
+        _OFFSET.pack_into(self.mem, _HEADER.size - _OFFSET.size, total)
+
+    def release(self, offset):
+        tag = self._tag(offset)
+        if tag & _FREE:
+            raise ValueError(f"Block at {offset} is already free")
+        order = tag & _ORDER_MASK
+        self._add_allocated(-(1 << order))
+        while order < self.max_order:
+            buddy = self._free_buddy(offset, order)
+            if buddy is None:
+                break
+            self._remove(buddy, order)
+            self._set_tag(max(offset, buddy), 0)
+            offset = min(offset, buddy)
+            order += 1
+        self._push(offset, order)
+
+    def reallocate(self, offset, old_nbytes, new_nbytes):
+        # Returns the (possibly new) offset; bytes past old_nbytes are zeroed like a fresh allocation
+        order = self._tag(offset) & _ORDER_MASK
+        needed = self._order_for(new_nbytes)
+
+        if needed <= order:
+            while order > needed:
+                order -= 1
+                self._push(offset + (1 << order), order)
+                self._add_allocated(-(1 << order))
+            self._set_tag(offset, needed)
+            if new_nbytes > old_nbytes:
+                self._zero(offset + old_nbytes, new_nbytes - old_nbytes)
+            return offset
+
+        # In place: every upper buddy up to the needed order must be free
+        relative = offset - self.data_base
+        if all(not relative & (1 << k) and self._free_buddy(offset, k) is not None for k in range(order, needed)):
+            for k in range(order, needed):
+                self._remove(offset + (1 << k), k)
+                self._set_tag(offset + (1 << k), 0)
+            self._set_tag(offset, needed)
+            self._add_allocated((1 << needed) - (1 << order))
+            self._zero(offset + old_nbytes, new_nbytes - old_nbytes)
+            return offset
+
+        new_offset = self.allocate(new_nbytes, zero=False)
+        self.mem[new_offset:new_offset + old_nbytes] = self.mem[offset:offset + old_nbytes]
+        self._zero(new_offset + old_nbytes, new_nbytes - old_nbytes)
+        self.release(offset)
+        return new_offset
+
+    def block_size(self, offset):
+        return 1 << (self._tag(offset) & _ORDER_MASK)
+
+    def block_size_for(self, nbytes):
+        # Size of the block allocate(nbytes) hands out
+        return 1 << self._order_for(nbytes)
+
+    def view(self, offset, nbytes):
+        return self.mem[offset:offset + nbytes]
+
+    def stats(self):
+        allocated = self._allocated()
+        free = self.data_size - allocated
+        largest = 0
+        for order in range(self.max_order, self.min_order - 1, -1):
+            if self._head(order) != _NONE:
+                largest = 1 << order
+                break
+        return {
+            'capacity_bytes': self.data_size,
+            'metadata_bytes': self.data_base,
+            'allocated_bytes': allocated,
+            'free_bytes': free,
+            'largest_free_block': largest,
+            # Share of free space that cannot be handed out as one block
+            'external_fragmentation': 1.0 - largest / float(free) if free else 0.0,
+        }
+
+    def close(self):
+        self.mem.release()
+
+
+def _align(value, alignment):
+    return (value + alignment - 1) // alignment * alignment
@@ -0,0 +1,247 @@
+import threading
+import queue
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available within the acquire timeout."""
+
+
+class LatencyStats:
+    # Running count/total/max plus a fixed-size window for percentiles
+    def __init__(self, window=1024):
+        self.lock = threading.Lock()
+        self.window = window
+        self.samples = []
+        self.position = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        with self.lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            if len(self.samples) < self.window:
+                self.samples.append(seconds)
+            else:
+                self.samples[self.position] = seconds
+                self.position = (self.position + 1) % self.window
+
+    def summary(self):
+        with self.lock:
+            ordered = sorted(self.samples)
+            count, total, maximum = self.count, self.total, self.max
+
+        def pct(p):
+            if not ordered:
+                return None
+            return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))] * 1000.0
+
+        return {
+            'count': count,
+            'mean_ms': total / count * 1000.0 if count else None,
+            'p50_ms': pct(50),
+            'p99_ms': pct(99),
+            'max_ms': maximum * 1000.0,
+        }
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of DB-API connections.
+
+    ``connect`` is any zero-argument factory, so tests can hand in sqlite3 or a fake
+    instead of mysql.connector. Idle connections are health-checked before reuse.
+    """
+
+    def __init__(self, connect, size=5, acquire_timeout=5.0, health_check_interval=30.0, health_check=None):
+        self.connect = connect
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self.health_check = health_check or default_health_check
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.created = 0
+        self.in_use = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.wait_stats = LatencyStats()
+        self.query_stats = LatencyStats()
+
+    def acquire(self, timeout=None):
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.perf_counter()
+        deadline = started + timeout
+        while True:
+            conn, checked_at = self._take(deadline)
+            if conn is None:
+                with self.lock:
+                    self.timeouts += 1
+                raise PoolTimeoutError(f"No connection available within {timeout}s (pool size {self.size})")
+            if time.monotonic() - checked_at < self.health_check_interval or self._healthy(conn):
+                break
+            self._discard(conn)
+        self.wait_stats.record(time.perf_counter() - started)
+        with self.lock:
+            self.in_use += 1
+        return conn
+
+    def _take(self, deadline):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            can_create = self.created < self.size
+            if can_create:
+                self.created += 1
+        if can_create:
+            try:
+                return self.connect(), time.monotonic()
+            except Exception:
+                with self.lock:
+                    self.created -= 1
+                raise
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return None, None
+        try:
+            return self.idle.get(timeout=remaining)
+        except queue.Empty:
+            return None, None
+
+    def _healthy(self, conn):
+        try:
+            return self.health_check(conn)
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.lock:
+            self.created -= 1
+            self.discarded += 1
+
+    def release(self, conn, broken=False):
+        with self.lock:
+            self.in_use -= 1
+        if broken:
+            self._discard(conn)
+        else:
+            self.idle.put((conn, time.monotonic()))
+
+    def connection(self):
+        return _PooledConnection(self)
+
+    def execute(self, sql, params=(), many=False):
+        # Run one statement (or executemany) and commit, returning the affected row count
+        with self.connection() as conn:
+            started = time.perf_counter()
+            cursor = conn.cursor()
+            try:
+                if many:
+                    cursor.executemany(sql, params)
+                else:
+                    cursor.execute(sql, params)
+                conn.commit()
+                return cursor.rowcount
+            finally:
+                cursor.close()
+                self.query_stats.record(time.perf_counter() - started)
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        with self.lock:
+            counters = {
+                'size': self.size,
+                'created': self.created,
+                'in_use': self.in_use,
+                'idle': self.idle.qsize(),
+                'acquire_timeouts': self.timeouts,
+                'discarded': self.discarded,
+            }
+        counters['pool_wait'] = self.wait_stats.summary()
+        counters['query'] = self.query_stats.summary()
+        return counters
+
+
+class _PooledConnection:
+    # Context manager that returns the connection to the pool, rolling back and discarding it on error
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = self.pool.acquire()
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        broken = False
+        if exc_type is not None:
+            try:
+                self.conn.rollback()
+            except Exception:
+                broken = True
+        self.pool.release(self.conn, broken=broken)
+        return False
+
+
+def default_health_check(conn):
+    # mysql.connector exposes is_connected(); anything else gets a trivial round trip
+    if hasattr(conn, 'is_connected'):
+        return conn.is_connected()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    return True
+
+
+class HTTPClient:
+    """Keep-alive requests.Session with a bounded connection pool and latency stats."""
+
+    def __init__(self, pool_connections=4, pool_maxsize=16, timeout=5.0, session=None):
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.request_stats = LatencyStats()
+        self.errors = 0
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.perf_counter()
+        try:
+            return self.session.get(url, **kwargs)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.request_stats.record(time.perf_counter() - started)
+
+    def stats(self):
+        return {'errors': self.errors, 'request': self.request_stats.summary()}
+
+    def close(self):
+        self.session.close()
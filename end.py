@@ -1,7 +1,11 @@
 from flask import Flask, request, jsonify
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+import json
 import mysql.connector
-import requests
+from datapool import ConnectionPool, HTTPClient
+from outbox import Outbox, OutboxFullError
+from httpcache import CachedFetcher
 
 app = Flask(__name__)
 
@@ -13,25 +17,68 @@ mysql_config = {
     'database': 'mydatabase'
 }
 
+# Connection pool configuration
+pool_config = {
+    'mysql_pool_size': 10,
+    'mysql_acquire_timeout': 5.0,       # seconds to wait for a free MySQL connection
+    'mysql_health_check_interval': 30.0,  # idle connections older than this are pinged before reuse
+    'mongo_max_pool_size': 50,
+    'mongo_wait_queue_timeout_ms': 5000,
+    'http_pool_maxsize': 16,
+    'http_timeout': 5.0,
+}
+
+# Upstream user-details cache configuration
+upstream_cache_config = {
+    'ttl_seconds': 30.0,       # entries older than this are revalidated with If-None-Match
+    'max_entries': 1024,
+    'wait_timeout': 10.0,      # how long coalesced callers wait for the in-flight fetch
+}
+
+# Bulk ingestion configuration
+bulk_config = {
+    'batch_size': 1000,              # records per executemany/insert_many and per commit
+    'max_line_bytes': 64 * 1024,     # longer NDJSON lines are rejected without being buffered
+    'max_reported_failures': 1000,   # failures beyond this are only counted
+}
+
+# Outbox (journaled dual-write) configuration. In outbox mode the MySQL users table needs a
+# UNIQUE idempotency_key column so replayed deliveries do not create duplicate rows.
+outbox_config = {
+    'enabled': False,
+    'default_mode': 'direct',        # 'direct' or 'outbox'; ?mode= overrides per request
+    'path': 'end_outbox.db',
+    'workers_per_store': 4,
+    'max_pending': 100000,           # appends are refused with 503 beyond this backlog
+    'retry_max_seconds': 30.0,
+}
+
 # MongoDB connection configuration
-mongo_client = MongoClient('mongodb://localhost:27017/')
+mongo_client = MongoClient('mongodb://localhost:27017/',
+                           maxPoolSize=pool_config['mongo_max_pool_size'],
+                           waitQueueTimeoutMS=pool_config['mongo_wait_queue_timeout_ms'])
 mongo_db = mongo_client['mydatabase']
 mongo_collection = mongo_db['users']
 
+# Pooled MySQL connections and a keep-alive session for the upstream fetch
+mysql_pool = ConnectionPool(lambda: mysql.connector.connect(**mysql_config),
+                            size=pool_config['mysql_pool_size'],
+                            acquire_timeout=pool_config['mysql_acquire_timeout'],
+                            health_check_interval=pool_config['mysql_health_check_interval'])
+http_client = HTTPClient(pool_maxsize=pool_config['http_pool_maxsize'], timeout=pool_config['http_timeout'])
+user_details_cache = CachedFetcher(http_client,
+                                   ttl=upstream_cache_config['ttl_seconds'],
+                                   max_entries=upstream_cache_config['max_entries'],
+                                   wait_timeout=upstream_cache_config['wait_timeout'])
+
 def insert_into_mysql(user_data):
     try:
-        conn = mysql.connector.connect(**mysql_config)
-        cursor = conn.cursor()
         sql = "INSERT INTO users (name, email) VALUES (%s, %s)"
-        cursor.execute(sql, (user_data['name'], user_data['email']))
-        conn.commit()
+        mysql_pool.execute(sql, (user_data['name'], user_data['email']))
         return True
     except Exception as e:
         print("Error inserting into MySQL:", e)
         return False
-    finally:
-        cursor.close()
-        conn.close()
 
 def insert_into_mongodb(user_data):
     try:
@@ -41,20 +88,184 @@ def insert_into_mongodb(user_data):
         print("Error inserting into MongoDB:", e)
         return False
 
+def apply_to_mysql(idempotency_key, user_data):
+    sql = ("INSERT INTO users (name, email, idempotency_key) VALUES (%s, %s, %s) "
+           "ON DUPLICATE KEY UPDATE idempotency_key = idempotency_key")
+    mysql_pool.execute(sql, (user_data['name'], user_data['email'], idempotency_key))
+
+def apply_to_mongodb(idempotency_key, user_data):
+    mongo_collection.update_one({'_id': idempotency_key},
+                                {'$setOnInsert': {'name': user_data['name'], 'email': user_data['email']}},
+                                upsert=True)
+
+outbox = None
+if outbox_config['enabled']:
+    outbox = Outbox(outbox_config['path'],
+                    {'mysql': apply_to_mysql, 'mongodb': apply_to_mongodb},
+                    workers_per_store=outbox_config['workers_per_store'],
+                    max_pending=outbox_config['max_pending'],
+                    retry_max=outbox_config['retry_max_seconds'])
+
+def validate_user_record(record):
+    if not isinstance(record, dict):
+        return 'Record is not a JSON object'
+    for field in ('name', 'email'):
+        if not isinstance(record.get(field), str) or not record[field].strip():
+            return f"Missing or empty '{field}'"
+    if '@' not in record['email']:
+        return 'Invalid email'
+    return None
+
+def insert_batch_into_mysql(batch):
+    # batch is a list of (line number, record); returns {line number: error} for rows that failed
+    sql = "INSERT INTO users (name, email) VALUES (%s, %s)"
+    rows = [(record['name'], record['email']) for _, record in batch]
+    try:
+        mysql_pool.execute(sql, rows, many=True)
+        return {}
+    except Exception as e:
+        print("Bulk insert into MySQL failed, retrying row by row:", e)
+
+    # Find the offending rows without giving up on the rest of the batch
+    failures = {}
+    with mysql_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for line_number, record in batch:
+                try:
+                    cursor.execute(sql, (record['name'], record['email']))
+                except Exception as e:
+                    failures[line_number] = f"MySQL: {e}"
+            conn.commit()
+        finally:
+            cursor.close()
+    return failures
+
+def insert_batch_into_mongodb(batch):
+    documents = [{'name': record['name'], 'email': record['email']} for _, record in batch]
+    try:
+        mongo_collection.insert_many(documents, ordered=False)
+        return {}
+    except BulkWriteError as e:
+        return {batch[error['index']][0]: f"MongoDB: {error.get('errmsg')}" for error in e.details.get('writeErrors', [])}
+    except Exception as e:
+        return {line_number: f"MongoDB: {e}" for line_number, _ in batch}
+
+class BulkResult:
+    def __init__(self):
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.batches = 0
+        self.failures = []
+
+    def fail(self, line_number, error):
+        self.failed += 1
+        if len(self.failures) < bulk_config['max_reported_failures']:
+            self.failures.append({'line': line_number, 'error': error})
+
+    def flush(self, batch):
+        if not batch:
+            return
+        self.batches += 1
+        failures = insert_batch_into_mysql(batch)
+        # Only rows that reached MySQL are written to MongoDB, keeping both stores in step
+        written = [item for item in batch if item[0] not in failures]
+        failures.update(insert_batch_into_mongodb(written))
+        for line_number, error in sorted(failures.items()):
+            self.fail(line_number, error)
+        self.inserted += len(batch) - len(failures)
+
+    def to_dict(self):
+        return {
+            'received': self.received,
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'batches': self.batches,
+            'failures': self.failures,
+            'failures_truncated': self.failed > len(self.failures),
+        }
+
+def read_ndjson_lines(stream, max_line_bytes):
+    # Yields (line number, bytes or None when the line was too long) without buffering the whole body
+    line_number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        line_number += 1
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # Drain the rest of the oversized line in bounded reads
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes)
+            yield line_number, None
+            continue
+        yield line_number, line
+
+@app.route('/insert-users-bulk', methods=['POST'])
+def insert_users_bulk():
+    # Stream an NDJSON body of {"name", "email"} records into MySQL and MongoDB in batches
+    result = BulkResult()
+    batch = []
+    try:
+        for line_number, line in read_ndjson_lines(request.stream, bulk_config['max_line_bytes']):
+            if line is None:
+                result.received += 1
+                result.fail(line_number, 'Line too long')
+                continue
+            if not line.strip():
+                continue
+            result.received += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                result.fail(line_number, f"Invalid JSON: {e}")
+                continue
+            error = validate_user_record(record)
+            if error:
+                result.fail(line_number, error)
+                continue
+            batch.append((line_number, record))
+            if len(batch) >= bulk_config['batch_size']:
+                result.flush(batch)
+                batch = []
+        result.flush(batch)
+    except Exception as e:
+        print("Error during bulk insert:", e)
+        body = result.to_dict()
+        body['error'] = 'Bulk insert aborted'
+        return jsonify(body), 500
+
+    return jsonify(result.to_dict()), 207 if result.failed else 200
+
 @app.route('/insert-user-from-endpoint', methods=['POST'])
 def insert_user_from_endpoint():
     try:
         # Assuming the endpoint returns JSON data with 'name' and 'email' fields
         endpoint_url = 'http://example.com/get-user-details'  # Replace with your actual endpoint URL
 
-        response = requests.get(endpoint_url)
+        response = user_details_cache.get(endpoint_url)
         if response.status_code != 200:
             return jsonify({'error': 'Failed to fetch user details from endpoint'}), 500
         
         user_data = response.json()
-        if 'name' not in user_data or 'email' not in user_data:
+        if not isinstance(user_data, dict) or 'name' not in user_data or 'email' not in user_data:
             return jsonify({'error': 'Invalid user data received from endpoint'}), 400
+        # Copy the cached body: insert_one adds an _id to the dict it is given
+        user_data = dict(user_data)
         
+        mode = request.args.get('mode', outbox_config['default_mode'])
+        if mode == 'outbox':
+            if outbox is None:
+                return jsonify({'error': 'Outbox mode is not enabled'}), 400
+            try:
+                key, created = outbox.append({'name': user_data['name'], 'email': user_data['email']},
+                                             request.headers.get('Idempotency-Key'))
+            except OutboxFullError as e:
+                return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+            message = 'User accepted for insertion' if created else 'User already accepted'
+            return jsonify({'message': message, 'idempotency_key': key}), 202
+
         if insert_into_mysql(user_data) and insert_into_mongodb(user_data):
             return jsonify({'message': 'User inserted successfully into both MySQL and MongoDB'}), 200
         else:
@@ -64,5 +275,15 @@ def insert_user_from_endpoint():
         print("Error:", e)
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/pool-stats', methods=['GET'])
+def pool_stats():
+    return jsonify({'mysql': mysql_pool.stats(), 'http': http_client.stats(), 'upstream_cache': user_details_cache.stats()})
+
+@app.route('/outbox-stats', methods=['GET'])
+def outbox_stats():
+    if outbox is None:
+        return jsonify({'error': 'Outbox mode is not enabled'}), 404
+    return jsonify(outbox.stats())
+
 if __name__ == '__main__':
     app.run(debug=True)
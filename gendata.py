@@ -1,37 +1,296 @@
-import random
-
-def generate_data(criteria):
-    # Generate synthetic data based on the given criteria
-    data = []
-    for _ in range(10):  # Generate 10 data points as an example
-        # Generate some random data based on the criteria
-        if criteria == "even":
-            value = random.randint(1, 100) * 2
-        elif criteria == "odd":
-            value = random.randint(1, 100) * 2 + 1
-        else:
-            value = random.randint(1, 100)
-        data.append(value)
-    return data
+import numpy as np
+import argparse
+import json
+import sys
+import os
+import time
+
+# Synthetic workload generation for the document service, end.py bulk ingestion and the memory manager.
+# Everything is drawn from one seeded numpy Generator, so the same arguments always produce the same data.
+# Run: python gendata.py numbers --count 10000000 --criteria even --format npy --output values.npy
+#      python gendata.py users --count 1000000 --output users.ndjson   (POST to /insert-users-bulk)
+#      python gendata.py documents --count 200 --output corpus/        (folder_path for /senseai/summarize)
+#      python gendata.py ops --count 100000 --output ops.ndjson        (POST to /batch as application/x-ndjson)
+
+DISTRIBUTIONS = ('uniform', 'normal', 'lognormal', 'exponential', 'poisson', 'zipf')
+
+FIRST_NAMES = np.array(['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+                        'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+                        'Charles', 'Karen', 'Priya', 'Arjun', 'Wei', 'Mei', 'Ahmed', 'Fatima', 'Carlos', 'Sofia'])
+LAST_NAMES = np.array(['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+                       'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson',
+                       'Reddy', 'Sharma', 'Chen', 'Wang', 'Khan', 'Ali', 'Silva', 'Rossi', 'Muller', 'Kim'])
+EMAIL_DOMAINS = np.array(['example.com', 'example.org', 'example.net', 'mail.test'])
+
+# Word list for document corpora; words are drawn with a Zipf law, so a few are very common as in real text
+VOCABULARY = np.array((
+    'the of and to in a is that for it as was with be by on not he this are or his from at which but have an they '
+    'you were her she there been one all we their has would when if so no will more can said who about up its out '
+    'time into them only some could these two may first then do any like my now over such our man me even most made '
+    'after also did many before must through back years where much your way well down should because each just those '
+    'people how too little state good very make world still own see men work long get here between both life being '
+    'under never day same another know while last might us great old year off come since against go came right used '
+    'take three memory model system data service request buffer stack heap document summary query answer report '
+    'process network storage latency throughput cache index record user email value result error response batch'
+).split())
+
+
+def sample_values(rng, count, criteria='any', distribution='uniform', low=1, high=100, mean=50.0, scale=15.0,
+                  exponent=1.5):
+    """
+    Draws count values in one vectorized call.
+
+    With criteria 'even' or 'odd' the draws are rounded to integers n and mapped to 2n and
+    2n + 1, as generate_data has always done; 'any' keeps the raw draws, which are floats
+    for the continuous distributions. low/high bound the uniform and zipf draws, mean/scale
+    parameterise the others (lognormal: median mean, sigma scale / mean).
+    """
+    if distribution == 'uniform':
+        values = rng.integers(low, high + 1, size=count)
+    elif distribution == 'normal':
+        values = rng.normal(mean, scale, size=count)
+    elif distribution == 'lognormal':
+        values = rng.lognormal(np.log(mean), scale / mean, size=count)
+    elif distribution == 'exponential':
+        values = rng.exponential(mean, size=count)
+    elif distribution == 'poisson':
+        values = rng.poisson(mean, size=count)
+    elif distribution == 'zipf':
+        values = np.minimum(rng.zipf(exponent, size=count), high)
+    else:
+        raise ValueError(f"Unknown distribution {distribution}; expected one of {', '.join(DISTRIBUTIONS)}")
+
+    if criteria == 'any':
+        return values
+    values = np.rint(values).astype(np.int64)
+    if criteria == 'even':
+        return values * 2
+    if criteria == 'odd':
+        return values * 2 + 1
+    raise ValueError(f"Unknown criteria {criteria}; expected even, odd or any")
+
+
+def generate_data(criteria, count=10, seed=None):
+    # Generate synthetic data based on the given criteria; anything but even/odd means any value, as before
+    criteria = criteria if criteria in ('even', 'odd') else 'any'
+    return sample_values(np.random.default_rng(seed), count, criteria).tolist()
+
+
+def chunk_sizes(total, chunk_size):
+    for start in range(0, total, chunk_size):
+        yield min(chunk_size, total - start)
+
+
+# Record generators: each yields one chunk at a time so memory stays bounded by chunk_size
+def number_chunks(rng, total, chunk_size, **options):
+    for size in chunk_sizes(total, chunk_size):
+        yield sample_values(rng, size, **options)
+
+
+def user_chunks(rng, total, chunk_size, invalid_rate=0.0):
+    # Payloads for end.py's /insert-users-bulk; emails are unique because they embed the record number
+    offset = 0
+    for size in chunk_sizes(total, chunk_size):
+        first = FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), size)]
+        last = LAST_NAMES[rng.integers(0, len(LAST_NAMES), size)]
+        domains = EMAIL_DOMAINS[rng.integers(0, len(EMAIL_DOMAINS), size)]
+        invalid = rng.random(size) < invalid_rate
+        records = []
+        for i, (f, l, d, bad) in enumerate(zip(first.tolist(), last.tolist(), domains.tolist(), invalid.tolist())):
+            email = f"{f.lower()}.{l.lower()}{offset + i}@{d}"
+            records.append({'name': f"{f} {l}", 'email': email.replace('@', '.') if bad else email})
+        offset += size
+        yield records
+
+
+def document_chunks(rng, total, chunk_size, mean_words=400, zipf_a=1.3):
+    offset = 0
+    for size in chunk_sizes(total, chunk_size):
+        lengths = np.maximum(1, rng.poisson(mean_words, size))
+        # Ranks past the word list are folded back in rather than clipped onto the last word
+        ranks = (rng.zipf(zipf_a, int(lengths.sum())) - 1) % len(VOCABULARY)
+        words = VOCABULARY[ranks]
+        bounds = np.concatenate(([0], np.cumsum(lengths)))
+        documents = []
+        for i in range(size):
+            text = ' '.join(words[bounds[i]:bounds[i + 1]].tolist())
+            documents.append({'id': f'doc-{offset + i:08d}', 'text': text[0].upper() + text[1:] + '.'})
+        offset += size
+        yield documents
+
+
+def operation_chunks(rng, total, chunk_size, keys=1000, stack_size=10000, heap_size=4096, dtype='int64'):
+    # Memory manager /batch streams: the first operations create every key, then a weighted mix follows
+    names = np.array(['push_stack', 'pop_stack', 'push_stack_many', 'pop_stack_many', 'fill_heap', 'read_heap',
+                      'check_memory_bounds', 'get_heap_content'])
+    weights = np.array([0.35, 0.25, 0.08, 0.07, 0.08, 0.1, 0.05, 0.02])
+    setup = []
+    for k in range(keys):
+        setup.append({'op': 'create_stack', 'key': f'stack-{k}', 'size': stack_size, 'dtype': dtype})
+        setup.append({'op': 'allocate_heap', 'key': f'heap-{k}', 'size': heap_size, 'dtype': dtype})
+        setup.append({'op': 'allocate_memory', 'key': f'mem-{k}', 'size': heap_size})
+    produced = 0
+    for size in chunk_sizes(total, chunk_size):
+        operations = setup[produced:produced + size]
+        remaining = size - len(operations)
+        ops = names[rng.choice(len(names), remaining, p=weights)].tolist()
+        key_ids = rng.integers(0, keys, remaining).tolist()
+        values = rng.integers(0, 1 << 31, remaining).tolist()
+        starts = rng.integers(0, heap_size, remaining).tolist()
+        counts = rng.integers(1, 64, remaining).tolist()
+        for op, k, value, start, n in zip(ops, key_ids, values, starts, counts):
+            if op == 'push_stack':
+                operations.append({'op': op, 'key': f'stack-{k}', 'value': value})
+            elif op == 'pop_stack':
+                operations.append({'op': op, 'key': f'stack-{k}'})
+            elif op == 'push_stack_many':
+                operations.append({'op': op, 'key': f'stack-{k}', 'values': list(range(value, value + n))})
+            elif op == 'pop_stack_many':
+                operations.append({'op': op, 'key': f'stack-{k}', 'count': n})
+            elif op == 'fill_heap':
+                operations.append({'op': op, 'key': f'heap-{k}', 'start': start,
+                                   'end': min(heap_size, start + n), 'value': value})
+            elif op == 'read_heap':
+                operations.append({'op': op, 'key': f'heap-{k}', 'start': start, 'end': min(heap_size, start + n)})
+            elif op == 'check_memory_bounds':
+                operations.append({'op': op, 'key': f'mem-{k}', 'index': start})
+            else:
+                operations.append({'op': op, 'key': f'heap-{k}'})
+        produced += size
+        yield operations
+
+
+# Writers: each consumes chunks and returns the number of records written
+def open_output(path, mode='w'):
+    if path == '-':
+        return os.fdopen(os.dup(sys.stdout.fileno()), mode)
+    return open(path, mode)
+
+
+def write_ndjson(chunks, path):
+    written = 0
+    with open_output(path) as f:
+        for chunk in chunks:
+            if isinstance(chunk, np.ndarray):
+                # Numbers are valid JSON lines already; skip json.dumps per value
+                lines = map(repr, chunk.tolist())
+            else:
+                lines = map(json.dumps, chunk)
+            f.write('\n'.join(lines))
+            f.write('\n')
+            written += len(chunk)
+    return written
+
+
+def write_csv(chunks, path, header=None):
+    written = 0
+    with open_output(path) as f:
+        if header:
+            f.write(header + '\n')
+        for chunk in chunks:
+            if isinstance(chunk, np.ndarray):
+                np.savetxt(f, chunk, fmt='%d' if chunk.dtype.kind in 'iu' else '%.17g')
+            else:
+                fields = list(chunk[0]) if chunk else []
+                f.write(''.join(','.join(str(record[field]) for field in fields) + '\n' for record in chunk))
+            written += len(chunk)
+    return written
+
+
+def write_npy(chunks, path, total):
+    # The header needs the final shape, so the file is created at full size and filled chunk by chunk
+    written = 0
+    array = None
+    for chunk in chunks:
+        if array is None:
+            array = np.lib.format.open_memmap(path, mode='w+', dtype=chunk.dtype, shape=(total,))
+        array[written:written + len(chunk)] = chunk
+        written += len(chunk)
+    if array is not None:
+        array.flush()
+    return written
+
+
+def write_text_files(chunks, directory):
+    # One .txt per document, the layout the document service reads from folder_path
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    for chunk in chunks:
+        for document in chunk:
+            with open(os.path.join(directory, document['id'] + '.txt'), 'w', encoding='utf-8') as f:
+                f.write(document['text'] + '\n')
+        written += len(chunk)
+    return written
 
-def process_data(data):
-    # Process the generated data
-    for value in data:
-        # Do something with each value, like printing or saving to a file
-        print(value)
 
 def main():
-    # Get criteria for generating data
-    criteria = input("Enter criteria for generating data (even, odd, or any): ")
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic workloads")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000, help="records generated and written at a time")
+    subparsers = parser.add_subparsers(dest='kind', required=True)
+
+    numbers = subparsers.add_parser('numbers', help="integers or floats from a distribution")
+    numbers.add_argument('--count', type=int, default=10)
+    numbers.add_argument('--criteria', choices=('even', 'odd', 'any'), default='any')
+    numbers.add_argument('--distribution', choices=DISTRIBUTIONS, default='uniform')
+    numbers.add_argument('--low', type=int, default=1)
+    numbers.add_argument('--high', type=int, default=100)
+    numbers.add_argument('--mean', type=float, default=50.0)
+    numbers.add_argument('--scale', type=float, default=15.0)
+    numbers.add_argument('--exponent', type=float, default=1.5, help="zipf exponent (> 1)")
+    numbers.add_argument('--format', choices=('ndjson', 'npy', 'csv'), default='ndjson')
+    numbers.add_argument('--output', default='-')
+
+    users = subparsers.add_parser('users', help="user payloads for end.py bulk ingestion")
+    users.add_argument('--count', type=int, default=1000)
+    users.add_argument('--invalid-rate', type=float, default=0.0, help="share of records with a malformed email")
+    users.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    users.add_argument('--output', default='-')
+
+    documents = subparsers.add_parser('documents', help="synthetic text corpus for the document service")
+    documents.add_argument('--count', type=int, default=100)
+    documents.add_argument('--mean-words', type=int, default=400)
+    documents.add_argument('--format', choices=('txt', 'ndjson'), default='txt')
+    documents.add_argument('--output', default='synthetic_corpus')
 
-    # Generate data based on criteria
-    data = generate_data(criteria)
+    ops = subparsers.add_parser('ops', help="memory manager operation stream for /batch")
+    ops.add_argument('--count', type=int, default=10000)
+    ops.add_argument('--keys', type=int, default=1000)
+    ops.add_argument('--dtype', default='int64', help="dtype for typed stacks and heaps ('none' for untyped)")
+    ops.add_argument('--output', default='-')
 
-    if data:
-        # Process the generated data
-        process_data(data)
+    args = parser.parse_args()
+    if args.kind == 'numbers' and args.format == 'npy' and args.output == '-':
+        # .npy files are memory-mapped at full size, which needs a real path rather than stdout
+        parser.error("--format npy needs --output with a file path")
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+
+    if args.kind == 'numbers':
+        chunks = number_chunks(rng, args.count, args.chunk_size, criteria=args.criteria,
+                               distribution=args.distribution, low=args.low, high=args.high,
+                               mean=args.mean, scale=args.scale, exponent=args.exponent)
+        if args.format == 'npy':
+            written = write_npy(chunks, args.output, args.count)
+        elif args.format == 'csv':
+            written = write_csv(chunks, args.output)
+        else:
+            written = write_ndjson(chunks, args.output)
+    elif args.kind == 'users':
+        chunks = user_chunks(rng, args.count, args.chunk_size, args.invalid_rate)
+        written = write_csv(chunks, args.output, 'name,email') if args.format == 'csv' else write_ndjson(chunks, args.output)
+    elif args.kind == 'documents':
+        chunks = document_chunks(rng, args.count, min(args.chunk_size, 10000), args.mean_words)
+        written = write_text_files(chunks, args.output) if args.format == 'txt' else write_ndjson(chunks, args.output)
     else:
-        print("Failed to generate data.")
+        dtype = None if args.dtype == 'none' else args.dtype
+        chunks = operation_chunks(rng, args.count, args.chunk_size, keys=args.keys, dtype=dtype)
+        written = write_ndjson(chunks, args.output)
+
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written} {args.kind} records in {elapsed:.2f}s ({written / elapsed if elapsed else 0:,.0f}/s)",
+          file=sys.stderr)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class CachedResponse:
+    # The subset of requests.Response that callers of the cache rely on
+    def __init__(self, status_code, data, etag=None):
+        self.status_code = status_code
+        self.data = data
+        self.etag = etag
+
+    def json(self):
+        return self.data
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class CachedFetcher:
+    """
+    TTL + LRU cache in front of a JSON GET, with ETag revalidation and single-flight coalescing.
+
+    Only 200 responses are cached. Once an entry's TTL expires it is revalidated with
+    If-None-Match; a 304 refreshes the entry without transferring the body. Concurrent
+    misses for the same URL wait on the first caller's request instead of issuing their own.
+    """
+
+    def __init__(self, client, ttl=30.0, max_entries=1024, wait_timeout=10.0):
+        self.client = client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'coalesced': 0, 'revalidated': 0, 'evictions': 0, 'errors': 0}
+
+    def get(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None and time.monotonic() < entry['expires_at']:
+                self.entries.move_to_end(url)
+                self.counters['hits'] += 1
+                return entry['response']
+            flight = self.flights.get(url)
+            if flight is not None:
+                self.counters['coalesced'] += 1
+                leader = False
+            else:
+                flight = self.flights[url] = _Flight()
+                self.counters['misses'] += 1
+                leader = True
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight fetch of {url}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        try:
+            flight.response = self._fetch(url, entry)
+            return flight.response
+        except Exception as e:
+            flight.error = e
+            with self.lock:
+                self.counters['errors'] += 1
+            raise
+        finally:
+            with self.lock:
+                del self.flights[url]
+            flight.done.set()
+
+    def _fetch(self, url, stale_entry):
+        headers = {}
+        if stale_entry is not None and stale_entry['response'].etag:
+            headers['If-None-Match'] = stale_entry['response'].etag
+        upstream = self.client.get(url, headers=headers)
+
+        if upstream.status_code == 304 and stale_entry is not None:
+            with self.lock:
+                self.counters['revalidated'] += 1
+                self._store(url, stale_entry['response'])
+            return stale_entry['response']
+
+        if upstream.status_code != 200:
+            return CachedResponse(upstream.status_code, None)
+        response = CachedResponse(200, upstream.json(), upstream.headers.get('ETag'))
+        with self.lock:
+            self._store(url, response)
+        return response
+
+    def _store(self, url, response):
+        # Called with the lock held
+        self.entries[url] = {'response': response, 'expires_at': time.monotonic() + self.ttl}
+        self.entries.move_to_end(url)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def invalidate(self, url=None):
+        with self.lock:
+            if url is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(url, None)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['entries'] = len(self.entries)
+            stats['in_flight'] = len(self.flights)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_ratio'] = (stats['hits'] + stats['coalesced']) / float(lookups) if lookups else None
+        return stats
@@ -1,126 +1,626 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
+from arena import Arena
+from mmapstore import MmapStore
+from shmstore import SharedMemoryManager
+from mmbatch import OpError, run_batch, stream_batch
+from spill import SpillStore
+from typedarray import DTYPES, new_array, from_bytes, itemsize, as_values, repeated, to_list
+from array import array
+import threading
+import pickle
+import json
+import re
+import sys
+
+# Storage backend configuration
+backend_config = {
+    'backend': 'memory',              # 'memory': per-key Python objects, 'arena': regions carved from one bytearray,
+                                      # 'mmap': regions in a memory-mapped file that survives restarts,
+                                      # 'shm': one shared-memory store for every worker process
+    'arena_size': 64 * 1024 * 1024,   # bytes preallocated for the arena backend
+    'arena_min_block': 64,            # smallest block the arena hands out
+    'mmap_path': 'memory_manager.dat',
+    'mmap_size': 16 * 1024 * 1024 * 1024,  # sparse file size; only written blocks take disk space
+    'mmap_min_block': 256,
+    'mmap_flush_interval': 5.0,       # seconds between background flushes (None: only on /flush)
+    'shm_name': 'memory_manager',     # workers attaching to the same name share one store
+    'shm_size': 256 * 1024 * 1024,
+    'shm_directory_slots': 65536,
+    'shm_stripes': 64,                # directory lock stripes
+    'budget_bytes': None,             # memory/arena backends: bytes kept resident before LRU regions are spilled
+    'spill_dir': 'memory_manager_spill',
+    'spill_compression_level': 1,     # zlib level for spilled regions; 1 favours latency over ratio
+}
+
+def synchronized(method):
+    # Runs the method under the manager's re-entrant lock so a batch can hold it across many calls
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+def value_bytes(value):
+    # Deep size of a JSON-like value: the container plus everything it holds
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(value_bytes(item) + value_bytes(item_value) for item, item_value in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(value_bytes(item) for item in value)
+    return size
 
 class MemoryManager:
-    def __init__(self):
+    def __init__(self, arena=None, store=None, spill=None):
         self.memory_storage = {}  # General memory storage
         self.buffer_memory = {}  # Buffer memory storage
         self.stack_memory = {}  # Stack memory storage
         self.heap_memory = {}  # Heap memory storage
+        self.store = store  # Persistent MmapStore; its arena is used and its index is kept in step
+        self.arena = store.arena if store is not None else arena  # When set, regions are arena blocks (one byte per slot)
+        self.spill = spill  # SpillStore enforcing a byte budget; None keeps everything resident
+        self.lock = threading.RLock()
+        self.spaces = {'general': self.memory_storage, 'buffer': self.buffer_memory, 'heap': self.heap_memory,
+                       'stack': self.stack_memory}
+        if store is not None:
+            # Reattach regions from the index; only views are created, no region data is read
+            for space, key, offset, size in store.regions():
+                self.spaces[space][key] = {'size': size, 'offset': offset, 'data': self.arena.view(offset, size)}
+
+    # Budget helpers: every resident entry is charged its real footprint and spilled when least recently used
+    def _entry_bytes(self, space, entry):
+        if space == 'stack':
+            # The list only holds pointers, so untyped stacks also carry the size of the values pushed
+            return sys.getsizeof(entry['stack']) + entry.get('value_bytes', 0)
+        if 'offset' in entry:
+            return self.arena.block_size(entry['offset'])
+        return sys.getsizeof(entry['data'])
+
+    def _estimate_bytes(self, space, size, dtype=None):
+        if dtype is not None:
+            return sys.getsizeof(new_array(dtype)) + size * itemsize(dtype)
+        if self.arena is not None and space != 'stack':
+            return self.arena.block_size_for(size)  # charged by block size, rounded up to a power of two
+        if space == 'buffer':
+            return size
+        return sys.getsizeof([]) + size * 8  # one pointer per list slot
+
+    def _charge(self, space, key, entry):
+        if self.spill is not None:
+            self.spill.charge((space, key), self._entry_bytes(space, entry))
+
+    def _check_budget(self, nbytes):
+        # Refuse anything that could never fit instead of letting it push the process out of memory
+        if self.spill is not None and nbytes > self.spill.max_bytes:
+            raise MemoryError(f"{nbytes} bytes exceeds the memory budget of {self.spill.max_bytes} bytes")
+
+    def _make_room(self, nbytes, exclude=None):
+        # Spill least recently used unpinned entries until nbytes more fit in the budget
+        if self.spill is None:
+            return
+        for space, key in self.spill.victims(exclude):
+            if self.spill.used + nbytes <= self.spill.max_bytes:
+                break
+            self._spill_entry(space, key)
+
+    def _arena_call(self, function, *args, exclude=None):
+        # Retries an arena allocation after spilling arena regions when it is too fragmented to fit
+        victims = [slot for slot in self.spill.victims(exclude) if slot[0] != 'stack'] if self.spill is not None else []
+        while True:
+            try:
+                return function(*args)
+            except MemoryError:
+                if not victims:
+                    raise
+                self._spill_entry(*victims.pop(0))
+
+    def _spill_entry(self, space, key):
+        entry = self.spaces[space][key]
+        if space == 'stack':
+            entry['depth'] = len(entry['stack'])
+            payload = pickle.dumps(entry.pop('stack'), pickle.HIGHEST_PROTOCOL)
+        elif isinstance(entry['data'], list):
+            payload = pickle.dumps(entry.pop('data'), pickle.HIGHEST_PROTOCOL)
+        elif 'dtype' in entry:
+            payload = entry.pop('data').tobytes()
+        else:
+            payload = bytes(entry.pop('data'))
+            if self.arena is not None:
+                self.arena.release(entry.pop('offset'))
+        self.spill.spill((space, key), payload)
+        entry['spilled'] = True
+
+    def _resident(self, space, key):
+        # The entry for key with its data faulted back in if it was spilled; marks it most recently used
+        entry = self.spaces[space].get(key)
+        if entry is None or self.spill is None:
+            return entry
+        if not entry.get('spilled'):
+            self.spill.touch((space, key))
+            return entry
+        size = entry['depth'] if space == 'stack' else entry['size']
+        nbytes = self._estimate_bytes(space, size, entry.get('dtype')) + entry.get('value_bytes', 0)
+        self._make_room(nbytes, exclude=(space, key))
+        in_arena = self.arena is not None and space != 'stack' and 'dtype' not in entry
+        if in_arena:
+            offset = self._arena_call(self.arena.allocate, entry['size'], False, exclude=(space, key))
+        payload = self.spill.fault((space, key))
+        del entry['spilled']
+        if space == 'stack':
+            entry['stack'] = pickle.loads(payload)
+            del entry['depth']
+        elif 'dtype' in entry:
+            entry['data'] = from_bytes(entry['dtype'], payload)
+        elif in_arena:
+            entry['offset'] = offset
+            entry['data'] = self.arena.view(offset, entry['size'])
+            entry['data'][:] = payload
+        elif space == 'buffer':
+            entry['data'] = bytearray(payload)
+        else:
+            entry['data'] = pickle.loads(payload)
+        self._charge(space, key, entry)
+        return entry
+
+    def _forget(self, space, key):
+        # Drops the key's budget charge and spill file once it is released
+        if self.spill is not None:
+            self.spill.forget((space, key))
+
+    # Region helpers shared by general, buffer and heap memory
+    def _new_region(self, space, key, size, make_data, dtype=None):
+        # Typed regions are always a standalone array; untyped ones live in the arena when there is one
+        self._check_budget(self._estimate_bytes(space, size, dtype))
+        self._make_room(self._estimate_bytes(space, size, dtype), exclude=(space, key))
+        if dtype is not None:
+            region = {'size': size, 'dtype': dtype, 'data': new_array(dtype, size)}
+            self._charge(space, key, region)
+            return region
+        if self.arena is None:
+            region = {'size': size, 'data': make_data(size)}
+            self._charge(space, key, region)
+            return region
+        offset = self._arena_call(self.arena.allocate, size, exclude=(space, key))
+        if self.store is not None:
+            self.store.put(space, key, offset, size)
+            self.store.mark_dirty(offset, size)
+        region = {'size': size, 'offset': offset, 'data': self.arena.view(offset, size)}
+        self._charge(space, key, region)
+        return region
+
+    def _free_region(self, space, key, region):
+        self._forget(space, key)
+        if region.get('spilled') or 'offset' not in region:
+            return
+        self.arena.release(region['offset'])
+        if self.store is not None:
+            self.store.delete(space, key)
+
+    def _resize_region(self, space, key, region, new_size):
+        if self.spill is not None:
+            dtype = region.get('dtype')
+            self._check_budget(self._estimate_bytes(space, new_size, dtype))
+            grown = self._estimate_bytes(space, new_size, dtype) - self._estimate_bytes(space, region['size'], dtype)
+            self._make_room(max(0, grown), exclude=(space, key))
+        if 'dtype' in region:
+            if new_size > region['size']:
+                region['data'].frombytes(bytes((new_size - region['size']) * region['data'].itemsize))
+            else:
+                del region['data'][new_size:]
+        elif self.arena is None:
+            region['data'].extend([None] * (new_size - region['size']))
+        else:
+            old_offset, old_size = region['offset'], region['size']
+            region['offset'] = self._arena_call(self.arena.reallocate, old_offset, old_size, new_size,
+                                                exclude=(space, key))
+            region['data'] = self.arena.view(region['offset'], new_size)
+            if self.store is not None:
+                self.store.put(space, key, region['offset'], new_size)
+                if region['offset'] != old_offset:
+                    self.store.mark_dirty(region['offset'], new_size)
+                else:
+                    self.store.mark_dirty(region['offset'] + old_size, new_size - old_size)
+        region['size'] = new_size
+        self._charge(space, key, region)
+
+    @synchronized
+    def region_written(self, space, key, start, end):
+        # Record bytes written through a view so the next flush persists them
+        region = self.spaces[space].get(key)
+        if self.store is not None and region is not None and 'offset' in region:
+            self.store.mark_dirty(region['offset'] + start, end - start)
+
+    # Pinned regions are never spilled, so views handed out for I/O stay valid
+    @synchronized
+    def pin_region(self, space, key):
+        if self._resident(space, key) is None:
+            return OpError(f"No {space} region exists for key {key}")
+        if self.spill is not None:
+            self.spill.pin((space, key))
+        return f"Pinned {space} region for key {key}"
+
+    @synchronized
+    def unpin_region(self, space, key):
+        if self.spill is not None:
+            self.spill.unpin((space, key))
+        return f"Unpinned {space} region for key {key}"
+
+    # Batch rollback support
+    @synchronized
+    def snapshot_key(self, space, key):
+        # Copy of one key's state, or None when the key does not exist
+        entry = self._resident(space, key)
+        if entry is None:
+            return None
+        if space == 'stack':
+            return {'size': entry['size'], 'dtype': entry.get('dtype'), 'stack': entry['stack'][:]}
+        data = entry['data']
+        if 'dtype' in entry:
+            return {'size': entry['size'], 'dtype': entry['dtype'], 'data': data[:]}
+        return {'size': entry['size'], 'data': bytes(data) if isinstance(data, (bytearray, memoryview)) else list(data)}
+
+    @synchronized
+    def restore_key(self, space, key, snapshot):
+        entries = self.spaces[space]
+        if snapshot is not None and entries.get(key, {}).get('views'):
+            # A transfer holds a view of this buffer, so its block must stay where it is; a buffer in use
+            # cannot have been released or resized by the batch, only written
+            entries[key]['data'][:] = snapshot['data']
+            self.region_written(space, key, 0, len(snapshot['data']))  # so /flush persists the rollback
+            return
+        if key in entries:
+            if space == 'stack':
+                del entries[key]
+                self._forget(space, key)
+            else:
+                self._free_region(space, key, entries.pop(key))
+        if snapshot is None:
+            return
+        if space == 'stack':
+            entries[key] = {'size': snapshot['size'], 'stack': snapshot['stack']}
+            if snapshot.get('dtype') is not None:
+                entries[key]['dtype'] = snapshot['dtype']
+            else:
+                entries[key]['value_bytes'] = sum(value_bytes(value) for value in snapshot['stack'])
+            self._charge(space, key, entries[key])
+            return
+        make_data = bytearray if space == 'buffer' else (lambda n: [None] * n)
+        region = self._new_region(space, key, snapshot['size'], make_data, snapshot.get('dtype'))
+        region['data'][:] = snapshot['data']
+        entries[key] = region
+
+    @synchronized
+    def flush(self):
+        if self.store is None:
+            return "Nothing to flush: the memory manager is not backed by a file"
+        result = self.store.flush()
+        return f"Flushed {result['bytes']} bytes in {result['ranges']} ranges"
+
+    def close(self):
+        # Drop every view into the arena before the backing mapping is closed
+        for space in self.spaces.values():
+            space.clear()
+        if self.store is not None:
+            self.store.close()
+        if self.spill is not None:
+            self.spill.close()
 
     # General Memory Management
+    @synchronized
     def allocate_memory(self, key, size):
         if key in self.memory_storage:
-            return f"Memory already allocated for key {key}"
-        self.memory_storage[key] = {'size': size, 'data': [None] * size}
+            return OpError(f"Memory already allocated for key {key}")
+        try:
+            self.memory_storage[key] = self._new_region('general', key, size, lambda n: [None] * n)
+        except MemoryError as e:
+            return OpError(f"Unable to allocate memory for key {key}: {e}")
         return f"Memory allocated for key {key} with size {size}"
 
+    @synchronized
     def release_memory(self, key):
         if key not in self.memory_storage:
-            return f"No memory allocated for key {key}"
-        del self.memory_storage[key]
+            return OpError(f"No memory allocated for key {key}")
+        self._free_region('general', key, self.memory_storage.pop(key))
         return f"Memory released for key {key}"
 
+    @synchronized
     def check_memory_bounds(self, key, index):
         if key not in self.memory_storage:
-            return f"No memory allocated for key {key}"
+            return OpError(f"No memory allocated for key {key}")
         if index < 0 or index >= self.memory_storage[key]['size']:
             return f"Index {index} is out of bounds for key {key} with size {self.memory_storage[key]['size']}"
         return f"Index {index} is within bounds for key {key}"
 
+    @synchronized
     def resize_memory(self, key, new_size):
         if key not in self.memory_storage:
-            return f"No memory allocated for key {key}"
+            return OpError(f"No memory allocated for key {key}")
         current_size = self.memory_storage[key]['size']
-        self.memory_storage[key]['data'].extend([None] * (new_size - current_size))
-        self.memory_storage[key]['size'] = new_size
+        try:
+            self._resize_region('general', key, self._resident('general', key), new_size)
+        except MemoryError as e:
+            return OpError(f"Unable to resize memory for key {key}: {e}")
         return f"Memory for key {key} resized from {current_size} to {new_size}"
 
     # Buffer Memory Management
+    @synchronized
     def create_buffer(self, key, size):
         if key in self.buffer_memory:
-            return f"Buffer already exists for key {key}"
-        self.buffer_memory[key] = {'size': size, 'data': bytearray(size)}
+            return OpError(f"Buffer already exists for key {key}")
+        try:
+            self.buffer_memory[key] = self._new_region('buffer', key, size, bytearray)
+        except MemoryError as e:
+            return OpError(f"Unable to create buffer for key {key}: {e}")
         return f"Buffer created for key {key} with size {size}"
 
+    @synchronized
     def release_buffer(self, key):
         if key not in self.buffer_memory:
-            return f"No buffer exists for key {key}"
-        del self.buffer_memory[key]
+            return OpError(f"No buffer exists for key {key}")
+        if self.buffer_memory[key].get('views'):
+            # Its block would be reused while a transfer still reads or writes it
+            return OpError(f"Buffer for key {key} is in use by {self.buffer_memory[key]['views']} transfers")
+        self._free_region('buffer', key, self.buffer_memory.pop(key))
         return f"Buffer released for key {key}"
 
+    @synchronized
     def get_buffer_content(self, key):
         if key not in self.buffer_memory:
-            return f"No buffer exists for key {key}"
-        return self.buffer_memory[key]['data']
+            return OpError(f"No buffer exists for key {key}")
+        return self._resident('buffer', key)['data']
+
+    @synchronized
+    def acquire_buffer_view(self, key):
+        # Zero-copy view of the buffer for the binary endpoints. Until release_buffer_view the buffer is
+        # neither spilled nor released, so the view cannot end up pointing at another key's block
+        if key not in self.buffer_memory:
+            return OpError(f"No buffer exists for key {key}")
+        self.pin_region('buffer', key)
+        entry = self.buffer_memory[key]
+        entry['views'] = entry.get('views', 0) + 1
+        return memoryview(entry['data'])
+
+    @synchronized
+    def release_buffer_view(self, key):
+        entry = self.buffer_memory.get(key)
+        if entry is not None and entry.get('views'):
+            entry['views'] -= 1
+        self.unpin_region('buffer', key)
 
     # Stack Memory Management
-    def create_stack(self, key, size):
+    @synchronized
+    def create_stack(self, key, size, dtype=None):
+        # With a dtype the stack holds unboxed elements in an array instead of Python objects in a list
         if key in self.stack_memory:
-            return f"Stack already exists for key {key}"
-        self.stack_memory[key] = {'size': size, 'stack': []}
+            return OpError(f"Stack already exists for key {key}")
+        if dtype is not None and self.store is not None:
+            return OpError(f"Unable to create stack for key {key}: typed stacks are not persisted by the mmap backend")
+        if dtype is None:
+            self.stack_memory[key] = {'size': size, 'stack': [], 'value_bytes': 0}
+        elif dtype not in DTYPES:
+            return OpError(f"Unknown dtype {dtype}; expected one of {', '.join(DTYPES)}")
+        else:
+            try:
+                self._check_budget(self._estimate_bytes('stack', size, dtype))  # typed capacity is exact
+            except MemoryError as e:
+                return OpError(f"Unable to create stack for key {key}: {e}")
+            self.stack_memory[key] = {'size': size, 'dtype': dtype, 'stack': new_array(dtype)}
+        self._charge('stack', key, self.stack_memory[key])
         return f"Stack created for key {key} with size {size}"
 
+    @synchronized
     def push_stack(self, key, value):
         if key not in self.stack_memory:
-            return f"No stack exists for key {key}"
-        if len(self.stack_memory[key]['stack']) >= self.stack_memory[key]['size']:
-            return f"Stack overflow for key {key}"
-        self.stack_memory[key]['stack'].append(value)
+            return OpError(f"No stack exists for key {key}")
+        entry = self._resident('stack', key)
+        if len(entry['stack']) >= entry['size']:
+            return OpError(f"Stack overflow for key {key}")
+        added = 0 if 'dtype' in entry else value_bytes(value)
+        try:
+            self._check_budget(self._entry_bytes('stack', entry) + added)
+            entry['stack'].append(value)
+        except (TypeError, OverflowError, MemoryError) as e:
+            return OpError(f"Unable to push to stack for key {key}: {e}")
+        self._stack_changed(key, entry, added)
         return f"Value pushed to stack for key {key}"
 
+    def _stack_changed(self, key, entry, added):
+        # Keeps an untyped stack's value total and its budget charge in step after a push or pop
+        if 'dtype' not in entry:
+            entry['value_bytes'] += added
+        if self.spill is not None:
+            self._charge('stack', key, entry)
+            if added > 0:
+                self._make_room(0, exclude=('stack', key))
+
+    @synchronized
+    def push_stack_many(self, key, values):
+        # Pushes every value or none of them; raw bytes are packed elements for typed stacks
+        if key not in self.stack_memory:
+            return OpError(f"No stack exists for key {key}")
+        entry = self._resident('stack', key)
+        try:
+            values = as_values(entry['stack'], values)
+        except (TypeError, OverflowError, ValueError) as e:
+            return OpError(f"Unable to push to stack for key {key}: {e}")
+        if len(entry['stack']) + len(values) > entry['size']:
+            return OpError(f"Stack overflow for key {key}: {len(values)} values do not fit in "
+                           f"{entry['size'] - len(entry['stack'])} free slots")
+        added = 0 if 'dtype' in entry else sum(value_bytes(value) for value in values)
+        try:
+            self._check_budget(self._entry_bytes('stack', entry) + added + len(values) * 8)
+        except MemoryError as e:
+            return OpError(f"Unable to push to stack for key {key}: {e}")
+        entry['stack'].extend(values)
+        self._stack_changed(key, entry, added)
+        return f"{len(values)} values pushed to stack for key {key}"
+
+    @synchronized
     def pop_stack(self, key):
         if key not in self.stack_memory:
-            return f"No stack exists for key {key}"
-        if not self.stack_memory[key]['stack']:
-            return f"Stack underflow for key {key}"
-        return self.stack_memory[key]['stack'].pop()
-
+            return OpError(f"No stack exists for key {key}")
+        entry = self._resident('stack', key)
+        if not entry['stack']:
+            return OpError(f"Stack underflow for key {key}")
+        value = entry['stack'].pop()
+        self._stack_changed(key, entry, 0 if 'dtype' in entry else -value_bytes(value))
+        return value
+
+    @synchronized
+    def pop_stack_many(self, key, count):
+        # The top count values, in the order single pops would return them
+        if key not in self.stack_memory:
+            return OpError(f"No stack exists for key {key}")
+        entry = self._resident('stack', key)
+        if count < 0 or count > len(entry['stack']):
+            return OpError(f"Stack underflow for key {key}: {count} values requested, {len(entry['stack'])} available")
+        start = len(entry['stack']) - count
+        values = entry['stack'][start:]
+        del entry['stack'][start:]
+        self._stack_changed(key, entry, 0 if 'dtype' in entry else -sum(value_bytes(value) for value in values))
+        values.reverse()
+        return to_list(values)
+
+    @synchronized
     def release_stack(self, key):
         if key not in self.stack_memory:
-            return f"No stack exists for key {key}"
+            return OpError(f"No stack exists for key {key}")
         del self.stack_memory[key]
+        self._forget('stack', key)
         return f"Stack released for key {key}"
 
     # Heap Memory Management
-    def allocate_heap(self, key, size):
+    @synchronized
+    def allocate_heap(self, key, size, dtype=None):
         if key in self.heap_memory:
-            return f"Heap memory already allocated for key {key}"
-        self.heap_memory[key] = {'size': size, 'data': [None] * size}
+            return OpError(f"Heap memory already allocated for key {key}")
+        if dtype is not None and self.store is not None:
+            # Typed regions are standalone arrays, so the store's index could not reattach them after a restart
+            return OpError(f"Unable to allocate heap memory for key {key}: typed heaps are not persisted by the mmap backend")
+        if dtype is not None and dtype not in DTYPES:
+            return OpError(f"Unknown dtype {dtype}; expected one of {', '.join(DTYPES)}")
+        try:
+            self.heap_memory[key] = self._new_region('heap', key, size, lambda n: [None] * n, dtype)
+        except MemoryError as e:
+            return OpError(f"Unable to allocate heap memory for key {key}: {e}")
         return f"Heap memory allocated for key {key} with size {size}"
 
+    @synchronized
     def release_heap(self, key):
         if key not in self.heap_memory:
-            return f"No heap memory allocated for key {key}"
-        del self.heap_memory[key]
+            return OpError(f"No heap memory allocated for key {key}")
+        self._free_region('heap', key, self.heap_memory.pop(key))
         return f"Heap memory released for key {key}"
 
+    @synchronized
     def get_heap_content(self, key):
         if key not in self.heap_memory:
-            return f"No heap memory allocated for key {key}"
-        return self.heap_memory[key]['data']
+            return OpError(f"No heap memory allocated for key {key}")
+        data = self._resident('heap', key)['data']
+        return data.tolist() if isinstance(data, (memoryview, array)) else data
 
+    def _heap_slice(self, key, start, end):
+        # Resident heap region and validated [start, end) bounds, or an OpError
+        if key not in self.heap_memory:
+            return OpError(f"No heap memory allocated for key {key}")
+        region = self._resident('heap', key)
+        end = region['size'] if end is None else end
+        if not 0 <= start <= end <= region['size']:
+            return OpError(f"Range {start}:{end} is out of bounds for key {key} with size {region['size']}")
+        return region, start, end
+
+    @synchronized
+    def fill_heap(self, key, start, end, value):
+        # Sets every slot in [start, end) to value with one slice assignment
+        found = self._heap_slice(key, start, end)
+        if isinstance(found, OpError):
+            return found
+        region, start, end = found
+        try:
+            region['data'][start:end] = repeated(region['data'], value, end - start)
+        except (TypeError, OverflowError, ValueError) as e:
+            return OpError(f"Unable to fill heap memory for key {key}: {e}")
+        self.region_written('heap', key, start, end)
+        return f"Filled {end - start} slots of heap memory for key {key}"
+
+    @synchronized
+    def read_heap(self, key, start, end=None):
+        found = self._heap_slice(key, start, end)
+        if isinstance(found, OpError):
+            return found
+        region, start, end = found
+        return to_list(region['data'][start:end])
+
+    @synchronized
     def resize_heap(self, key, new_size):
         if key not in self.heap_memory:
-            return f"No heap memory allocated for key {key}"
+            return OpError(f"No heap memory allocated for key {key}")
         current_size = self.heap_memory[key]['size']
-        self.heap_memory[key]['data'].extend([None] * (new_size - current_size))
-        self.heap_memory[key]['size'] = new_size
+        try:
+            self._resize_region('heap', key, self._resident('heap', key), new_size)
+        except MemoryError as e:
+            return OpError(f"Unable to resize heap memory for key {key}: {e}")
         return f"Heap memory for key {key} resized from {current_size} to {new_size}"
 
     # Get memory usage summary
+    @synchronized
     def get_memory_usage(self):
-        return {
-            'general_memory': {key: len(value['data']) for key, value in self.memory_storage.items()},
-            'buffer_memory': {key: len(value['data']) for key, value in self.buffer_memory.items()},
-            'stack_memory': {key: len(value['stack']) for key, value in self.stack_memory.items()},
-            'heap_memory': {key: len(value['data']) for key, value in self.heap_memory.items()}
+        usage = {
+            'general_memory': {key: value['size'] for key, value in self.memory_storage.items()},
+            'buffer_memory': {key: value['size'] for key, value in self.buffer_memory.items()},
+            'stack_memory': {key: value['depth'] if value.get('spilled') else len(value['stack'])
+                             for key, value in self.stack_memory.items()},
+            'heap_memory': {key: value['size'] for key, value in self.heap_memory.items()}
+        }
+        # Typed regions are sized exactly: elements times the dtype's item size
+        usage['typed'] = {
+            f'{space}:{key}': {
+                'dtype': entry['dtype'],
+                'capacity_bytes': entry['size'] * itemsize(entry['dtype']),
+                'used_bytes': (usage['stack_memory'][key] if space == 'stack' else entry['size']) * itemsize(entry['dtype']),
+            }
+            for space, entries in (('stack', self.stack_memory), ('heap', self.heap_memory))
+            for key, entry in entries.items() if 'dtype' in entry
         }
+        # Byte accounting covers resident regions; spilled ones are reported under 'budget'
+        regions = [region for region in (*self.memory_storage.values(), *self.buffer_memory.values(),
+                                         *self.heap_memory.values()) if not region.get('spilled')]
+        requested = sum(region['size'] for region in regions)
+        if self.arena is None:
+            # Real footprint of the per-key containers (list slots are pointers to None)
+            usage['bytes'] = {
+                'requested_bytes': requested,
+                'allocated_bytes': sum(sys.getsizeof(region['data']) for region in regions),
+            }
+        else:
+            stats = self.store.stats() if self.store is not None else self.arena.stats()
+            stats['requested_bytes'] = requested = sum(region['size'] for region in regions if 'offset' in region)
+            # Share of allocated block bytes lost to power-of-two rounding
+            stats['internal_fragmentation'] = 1.0 - requested / float(stats['allocated_bytes']) if stats['allocated_bytes'] else 0.0
+            usage['bytes'] = stats
+        if self.spill is not None:
+            usage['budget'] = self.spill.stats()
+        return usage
 
 
 from flask import Flask, request, jsonify
 
+def create_memory_manager(config):
+    spill = None
+    if config['budget_bytes'] and config['backend'] in ('memory', 'arena'):
+        spill = SpillStore(config['budget_bytes'], config['spill_dir'], config['spill_compression_level'])
+    if config['backend'] == 'arena':
+        return MemoryManager(Arena(bytearray(config['arena_size']), min_block=config['arena_min_block']), spill=spill)
+    if config['backend'] == 'mmap':
+        return MemoryManager(store=MmapStore(config['mmap_path'], config['mmap_size'],
+                                             min_block=config['mmap_min_block'],
+                                             flush_interval=config['mmap_flush_interval']))
+    if config['backend'] == 'shm':
+        return SharedMemoryManager(config['shm_name'], size=config['shm_size'],
+                                   directory_slots=config['shm_directory_slots'], stripes=config['shm_stripes'])
+    return MemoryManager(spill=spill)
+
 app = Flask(__name__)
-memory_manager = MemoryManager()
+memory_manager = create_memory_manager(backend_config)
 
 # General Memory Management Endpoints
 @app.route('/allocate_memory', methods=['POST'])
@@ -170,12 +670,113 @@ def get_buffer_content_endpoint():
     response = memory_manager.get_buffer_content(key)
     return jsonify({'content': response})
 
+# Binary buffer I/O
+BINARY_CHUNK_SIZE = 256 * 1024  # bytes handed to the WSGI server per write
+
+def lookup_buffer_view(key):
+    # URL keys are strings; fall back to the integer key a JSON client may have used.
+    # The buffer cannot be spilled or released while the view is in use; callers release the view.
+    view = memory_manager.acquire_buffer_view(key)
+    if isinstance(view, str) and key.lstrip('-').isdigit():
+        int_view = memory_manager.acquire_buffer_view(int(key))
+        if not isinstance(int_view, str):
+            return int(key), int_view
+    return key, view
+
+def parse_range(header, size):
+    # Returns (start, end) for a single "bytes=" range, None when absent, or False when unsatisfiable
+    if not header:
+        return None
+    match = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', header)
+    if not match or match.group(1) == match.group(2) == '':
+        return None  # malformed or multi-range headers are ignored and the whole buffer is sent
+    if match.group(1) == '':
+        length = int(match.group(2))
+        return (max(0, size - length), size) if length and size else False
+    start = int(match.group(1))
+    end = min(size, int(match.group(2)) + 1) if match.group(2) else size
+    if start >= size or end <= start:
+        return False
+    return start, end
+
+def iter_view(view, chunk_size=BINARY_CHUNK_SIZE):
+    # WSGI servers only accept bytes, so each chunk is materialised at the boundary; nothing larger is copied
+    for position in range(0, len(view), chunk_size):
+        yield bytes(view[position:position + chunk_size])
+
+@app.route('/buffer/<key>', methods=['GET'])
+def read_buffer_endpoint(key):
+    key, view = lookup_buffer_view(key)
+    if isinstance(view, str):
+        return jsonify({'message': view}), 404
+    size = len(view)
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if byte_range is False:
+        memory_manager.release_buffer_view(key)
+        return Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+    headers = {'Accept-Ranges': 'bytes'}
+    status = 200
+    if byte_range is not None:
+        start, end = byte_range
+        view = view[start:end]
+        headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+        status = 206
+    headers['Content-Length'] = str(len(view))
+    # Not direct_passthrough: werkzeug would hand the bare generator to the server and skip close callbacks.
+    # The callback runs when the server closes the response, including HEAD requests and clients that
+    # disconnect before the body is iterated, where a generator's finally block would never run
+    response = Response(iter_view(view), status=status, headers=headers, mimetype='application/octet-stream')
+    response.call_on_close(lambda: memory_manager.release_buffer_view(key))
+    return response
+
+@app.route('/buffer/<key>', methods=['PUT'])
+def write_buffer_endpoint(key):
+    # Streams the request body into the buffer at ?offset=, reading straight into the buffer where possible
+    key, view = lookup_buffer_view(key)
+    if isinstance(view, str):
+        return jsonify({'message': view}), 404
+    try:
+        return write_into_view(key, view)
+    finally:
+        memory_manager.release_buffer_view(key)
+
+def write_into_view(key, view):
+    offset = request.args.get('offset', 0, type=int)
+    length = request.content_length
+    if offset < 0 or offset > len(view):
+        return jsonify({'message': f"Offset {offset} is out of bounds for buffer {key} with size {len(view)}"}), 416
+    if length is not None and offset + length > len(view):
+        return jsonify({'message': f"Writing {length} bytes at offset {offset} exceeds buffer {key} with size {len(view)}"}), 413
+
+    stream = request.stream
+    readinto = getattr(stream, 'readinto', None)
+    end = len(view) if length is None else offset + length
+    position = offset
+    while position < end:
+        target = view[position:min(end, position + BINARY_CHUNK_SIZE)]
+        if readinto is not None:
+            n = readinto(target)
+        else:
+            chunk = stream.read(len(target))
+            n = len(chunk)
+            target[:n] = chunk
+        if not n:
+            break
+        position += n
+    memory_manager.region_written('buffer', key, offset, position)
+    if length is None and stream.read(1):
+        return jsonify({'message': f"Body exceeds buffer {key} with size {len(view)}; wrote {position - offset} bytes",
+                        'written': position - offset}), 413
+    return jsonify({'message': f"Wrote {position - offset} bytes to buffer {key} at offset {offset}",
+                    'written': position - offset})
+
 # Stack Memory Management Endpoints
 @app.route('/create_stack', methods=['POST'])
 def create_stack_endpoint():
     key = request.json.get('key')
     size = request.json.get('size')
-    response = memory_manager.create_stack(key, size)
+    dtype = request.json.get('dtype')
+    response = memory_manager.create_stack(key, size, dtype)
     return jsonify({'message': response})
 
 @app.route('/push_stack', methods=['POST'])
@@ -191,6 +792,20 @@ def pop_stack_endpoint():
     response = memory_manager.pop_stack(key)
     return jsonify({'message': response})
 
+@app.route('/push_stack_many', methods=['POST'])
+def push_stack_many_endpoint():
+    key = request.json.get('key')
+    values = request.json.get('values', [])
+    response = memory_manager.push_stack_many(key, values)
+    return jsonify({'message': response})
+
+@app.route('/pop_stack_many', methods=['POST'])
+def pop_stack_many_endpoint():
+    key = request.json.get('key')
+    count = request.json.get('count', 1)
+    response = memory_manager.pop_stack_many(key, count)
+    return jsonify({'message': response})
+
 @app.route('/release_stack', methods=['POST'])
 def release_stack_endpoint():
     key = request.json.get('key')
@@ -202,7 +817,8 @@ def release_stack_endpoint():
 def allocate_heap_endpoint():
     key = request.json.get('key')
     size = request.json.get('size')
-    response = memory_manager.allocate_heap(key, size)
+    dtype = request.json.get('dtype')
+    response = memory_manager.allocate_heap(key, size, dtype)
     return jsonify({'message': response})
 
 @app.route('/release_heap', methods=['POST'])
@@ -224,6 +840,83 @@ def resize_heap_endpoint():
     response = memory_manager.resize_heap(key, new_size)
     return jsonify({'message': response})
 
+@app.route('/fill_heap', methods=['POST'])
+def fill_heap_endpoint():
+    key = request.json.get('key')
+    start = request.json.get('start', 0)
+    end = request.json.get('end')
+    value = request.json.get('value')
+    response = memory_manager.fill_heap(key, start, end, value)
+    return jsonify({'message': response})
+
+@app.route('/read_heap', methods=['POST'])
+def read_heap_endpoint():
+    key = request.json.get('key')
+    start = request.json.get('start', 0)
+    end = request.json.get('end')
+    response = memory_manager.read_heap(key, start, end)
+    return jsonify({'content': response})
+
+# Batched operations
+BATCH_CHUNK_SIZE = 256  # NDJSON operations applied per acquisition of the manager lock
+
+def read_ndjson_operations(stream):
+    # One operation per line; malformed lines become operations that fail instead of aborting the batch
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield {'op': None, '_parse_error': str(e)}
+
+@app.route('/batch', methods=['POST'])
+def batch_endpoint():
+    # JSON: {"operations": [{"op": "push_stack", "key": ..., "value": ...}, ...], "atomic": false}
+    # NDJSON (application/x-ndjson): one operation per line, ?atomic=true for all-or-nothing
+    if request.mimetype == 'application/x-ndjson':
+        atomic = request.args.get('atomic', 'false').lower() in ('1', 'true', 'yes')
+        if not atomic:
+            # The body is read, applied and answered in bounded sub-batches while the response streams
+            results = stream_batch(memory_manager, read_ndjson_operations(request.stream), BATCH_CHUNK_SIZE)
+            lines = (json.dumps(result, default=str) + '\n' for result in results)
+            return Response(stream_with_context(lines), mimetype='application/x-ndjson',
+                            headers={'X-Batch-Rolled-Back': 'false'})
+        # All-or-nothing needs one lock acquisition, so the whole body is read and parsed before taking it
+        operations = list(read_ndjson_operations(request.stream))
+        results, rolled_back = run_batch(memory_manager, operations, atomic)
+        lines = (json.dumps(result, default=str) + '\n' for result in results)
+        return Response(lines, mimetype='application/x-ndjson',
+                        headers={'X-Batch-Rolled-Back': 'true' if rolled_back else 'false'})
+
+    operations = request.json.get('operations', [])
+    atomic = bool(request.json.get('atomic', False))
+    results, rolled_back = run_batch(memory_manager, operations, atomic)
+    return jsonify({'results': results, 'rolled_back': rolled_back})
+
+# Keep regions resident under a memory budget
+@app.route('/pin_region', methods=['POST'])
+def pin_region_endpoint():
+    space = request.json.get('space')
+    key = request.json.get('key')
+    if space not in ('general', 'buffer', 'heap', 'stack'):
+        return jsonify({'message': f"Unknown memory space {space}"}), 400
+    response = memory_manager.pin_region(space, key)
+    return jsonify({'message': response})
+
+@app.route('/unpin_region', methods=['POST'])
+def unpin_region_endpoint():
+    space = request.json.get('space')
+    key = request.json.get('key')
+    response = memory_manager.unpin_region(space, key)
+    return jsonify({'message': response})
+
+# Persist dirty regions of a file-backed memory manager
+@app.route('/flush', methods=['POST'])
+def flush_endpoint():
+    response = memory_manager.flush()
+    return jsonify({'message': response})
+
 # Endpoint for getting memory usage
 @app.route('/memory_usage', methods=['GET'])
 def memory_usage_endpoint():
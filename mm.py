@@ -1,7 +1,24 @@
+import tracemalloc
 import traceback
+import threading
+import resource
+import time
 import gc
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+import os
+from flask import Flask, request, jsonify
+
+# Memory-pressure monitor configuration
+monitor_config = {
+    'sample_interval': 1.0,                   # seconds between RSS / GC samples
+    'rss_soft_limit_bytes': 512 * 1024 * 1024,  # above this a full collection may run
+    'rss_growth_trigger': 0.25,               # RSS growth since the last collection that triggers a young collection
+    'min_collect_interval': 30.0,             # seconds between pressure-triggered collections
+    'gc_thresholds': (50000, 20, 20),         # fewer generation-0 passes for allocation-heavy services
+    'freeze_after_startup': True,             # move startup objects out of the collector's reach
+    'tracemalloc_frames': 0,                  # >0 enables tracemalloc with this many frames per trace
+    'top_allocations': 20,
+    'port': 5001,
+}
 
 @staticmethod
 def generic_try_except(func):
@@ -13,40 +30,184 @@ def generic_try_except(func):
             traceback.print_exc()
     return wrapper
 
+def read_rss():
+    # Resident set size from /proc; falls back to the peak reported by getrusage elsewhere
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class PauseStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.collected = 0
+        self.uncollectable = 0
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000.0,
+            'mean_ms': self.total / self.count * 1000.0 if self.count else None,
+            'max_ms': self.max * 1000.0,
+            'collected': self.collected,
+            'uncollectable': self.uncollectable,
+        }
+
 class MemoryManagementService:
-    @staticmethod
-    @generic_try_except
-    def garbage_collection():
-        try:
-            # Perform garbage collection
+    """
+    Samples process memory and garbage-collector activity and collects only under pressure.
+
+    Every collection, automatic or not, is timed through ``gc.callbacks``. A young
+    collection runs when RSS has grown by ``rss_growth_trigger`` since the last one, and a
+    full collection when RSS is also over ``rss_soft_limit_bytes``. Both are rate limited by
+    ``min_collect_interval``.
+    """
+
+    def __init__(self, config=monitor_config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.pauses = [PauseStats() for _ in range(3)]
+        self.pause_started = None
+        self.rss = self.rss_peak = self.rss_baseline = read_rss()
+        self.last_collection = 0.0
+        self.pressure_events = 0
+        self.triggered = {'young': 0, 'full': 0}
+        self.last_freed_bytes = None
+        self.last_snapshot = None
+        self.stopping = threading.Event()
+        self.sampler = None
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self.pause_started = time.perf_counter()
+        elif self.pause_started is not None:
+            elapsed = time.perf_counter() - self.pause_started
+            self.pause_started = None
+            stats = self.pauses[info['generation']]
+            stats.count += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+            stats.collected += info['collected']
+            stats.uncollectable += info['uncollectable']
+
+    def start(self):
+        gc.set_threshold(*self.config['gc_thresholds'])
+        gc.callbacks.append(self._on_gc)
+        if self.config['tracemalloc_frames'] and not tracemalloc.is_tracing():
+            tracemalloc.start(self.config['tracemalloc_frames'])
+        self.sampler = threading.Thread(target=self._sample_periodically, daemon=True)
+        self.sampler.start()
+
+    def startup_complete(self):
+        # Objects alive after startup (modules, config, caches) are moved to the permanent generation
+        if self.config['freeze_after_startup']:
             gc.collect()
-            print("Garbage collection executed successfully.")
-        except Exception as e:
-            print("Error in garbage collection:")
-            traceback.print_exc()
+            gc.freeze()
+        self.rss_baseline = read_rss()
 
-class FileChangeHandler(FileSystemEventHandler):
-    def __init__(self, memory_manager):
-        self.memory_manager = memory_manager
+    def stop(self):
+        self.stopping.set()
+        if self.sampler is not None:
+            self.sampler.join()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
 
-    def on_modified(self, event):
-        if event.src_path.endswith("sample1.txt"):  # Check if the modified file is "sample1.txt"
-            print("Detected modification in sample1.txt. Triggering garbage collection.")
-            self.memory_manager.garbage_collection()
+    def _sample_periodically(self):
+        while not self.stopping.wait(self.config['sample_interval']):
+            self.sample()
 
-# Example usage with watchdog:
-if __name__ == "__main__":
-    memory_manager = MemoryManagementService()
-    
-    observer = Observer()
-    event_handler = FileChangeHandler(memory_manager)
-    directory_to_watch = "."  # Update with the correct directory path
-    observer.schedule(event_handler, path=directory_to_watch, recursive=False)
+    @generic_try_except
+    def sample(self):
+        rss = read_rss()
+        with self.lock:
+            self.rss = rss
+            self.rss_peak = max(self.rss_peak, rss)
+            grown = rss > self.rss_baseline * (1.0 + self.config['rss_growth_trigger'])
+            due = time.monotonic() - self.last_collection >= self.config['min_collect_interval']
+            if grown:
+                self.pressure_events += 1  # samples taken while over the growth trigger
+        if not grown or not due:
+            return
+        if tracemalloc.is_tracing():
+            self.last_snapshot = tracemalloc.take_snapshot()
+        generation = 2 if rss > self.config['rss_soft_limit_bytes'] else 1
+        self.garbage_collection(generation)
+
+    @generic_try_except
+    def garbage_collection(self, generation=2):
+        # Collect up to the given generation and record how much resident memory it gave back
+        before = read_rss()
+        gc.collect(generation)
+        after = read_rss()
+        with self.lock:
+            self.triggered['full' if generation == 2 else 'young'] += 1
+            self.last_collection = time.monotonic()
+            self.last_freed_bytes = before - after
+            self.rss = after
+            self.rss_baseline = after
+        print(f"Garbage collection of generation {generation} under memory pressure freed {before - after} bytes.")
 
+    def metrics(self):
+        with self.lock:
+            metrics = {
+                'rss_bytes': self.rss,
+                'rss_peak_bytes': self.rss_peak,
+                'rss_baseline_bytes': self.rss_baseline,
+                'pressure_events': self.pressure_events,
+                'triggered_collections': dict(self.triggered),
+                'last_freed_bytes': self.last_freed_bytes,
+            }
+        metrics['gc'] = {
+            'counts': gc.get_count(),
+            'thresholds': gc.get_threshold(),
+            'frozen_objects': gc.get_freeze_count(),
+            'pauses': {str(generation): stats.summary() for generation, stats in enumerate(self.pauses)},
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            metrics['tracemalloc'] = {'current_bytes': current, 'peak_bytes': peak}
+        return metrics
+
+    def top_allocations(self, limit=None, compare=False):
+        # Largest allocation sites now, or their growth since the last pressure snapshot
+        if not tracemalloc.is_tracing():
+            return None
+        limit = limit or self.config['top_allocations']
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        if compare and self.last_snapshot is not None:
+            statistics = snapshot.compare_to(self.last_snapshot, 'lineno')
+            return [{'site': str(stat.traceback[0]), 'size_bytes': stat.size, 'size_diff_bytes': stat.size_diff,
+                     'count': stat.count, 'count_diff': stat.count_diff} for stat in statistics[:limit]]
+        return [{'site': str(stat.traceback[0]), 'size_bytes': stat.size, 'count': stat.count}
+                for stat in snapshot.statistics('lineno')[:limit]]
+
+app = Flask(__name__)
+memory_manager = MemoryManagementService()
+
+@app.route('/memory/metrics', methods=['GET'])
+def memory_metrics_endpoint():
+    return jsonify(memory_manager.metrics())
+
+@app.route('/memory/top-allocations', methods=['GET'])
+def top_allocations_endpoint():
+    limit = request.args.get('limit', type=int)
+    compare = request.args.get('compare', 'false').lower() in ('1', 'true', 'yes')
+    sites = memory_manager.top_allocations(limit, compare)
+    if sites is None:
+        return jsonify({'message': "tracemalloc is disabled; set tracemalloc_frames in monitor_config"}), 409
+    return jsonify({'sites': sites})
+
+if __name__ == "__main__":
+    memory_manager.start()
+    memory_manager.startup_complete()
     try:
-        observer.start()
-        print(f"Watching for changes in {directory_to_watch}...")
-        observer.join()  # Keep the observer running
-    except KeyboardInterrupt:
-        observer.stop()
-        observer.join()
+        print(f"Monitoring memory pressure; metrics on port {monitor_config['port']}...")
+        app.run(port=monitor_config['port'])
+    finally:
+        memory_manager.stop()
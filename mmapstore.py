@@ -0,0 +1,117 @@
+import threading
+import sqlite3
+import json
+import mmap
+import os
+
+from arena import Arena
+
+
+class MmapStore:
+    """
+    Persistent region storage: an arena inside a memory-mapped sparse file plus a SQLite
+    index of (space, key) -> (offset, size).
+
+    Region bytes are only ever touched through the mapping, so data sets larger than RAM
+    are paged by the OS. ``flush`` writes dirty byte ranges back to the file and then
+    commits the index, making it the durability point. On reopen the arena's free lists
+    are rebuilt from the index alone; no region data is read.
+    """
+
+    def __init__(self, path, size, min_block=256, flush_interval=None):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self.file.truncate(size)  # sparse: blocks are only allocated on disk when written
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.arena = Arena(self.map, min_block=min_block, initialize=not exists)
+        self.lock = threading.RLock()
+        self.dirty = []
+        self.index = sqlite3.connect(path + '.index', check_same_thread=False)
+        self.index.execute("""CREATE TABLE IF NOT EXISTS regions (
+            space TEXT NOT NULL,
+            key TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (space, key))""")
+        self.index.commit()
+        if exists:
+            # The index is authoritative; allocator state in the file may be ahead of the last flush
+            self.arena.rebuild([(offset, size) for _, _, offset, size in self.regions()])
+
+        self.stopping = threading.Event()
+        self.flusher = None
+        if flush_interval:
+            self.flusher = threading.Thread(target=self._flush_periodically, args=(flush_interval,), daemon=True)
+            self.flusher.start()
+
+    def regions(self):
+        with self.lock:
+            rows = self.index.execute("SELECT space, key, offset, size FROM regions").fetchall()
+        return [(space, json.loads(key), offset, size) for space, key, offset, size in rows]
+
+    def put(self, space, key, offset, size):
+        with self.lock:
+            self.index.execute("INSERT OR REPLACE INTO regions (space, key, offset, size) VALUES (?, ?, ?, ?)",
+                               (space, json.dumps(key), offset, size))
+
+    def delete(self, space, key):
+        with self.lock:
+            self.index.execute("DELETE FROM regions WHERE space = ? AND key = ?", (space, json.dumps(key)))
+
+    def mark_dirty(self, offset, size):
+        if size > 0:
+            with self.lock:
+                self.dirty.append((offset, offset + size))
+
+    def flush(self):
+        with self.lock:
+            ranges = sorted(self.dirty)
+            self.dirty = []
+            flushed = 0
+            merged = []
+            for start, end in ranges:
+                # msync needs page-aligned offsets
+                start -= start % mmap.PAGESIZE
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            for start, end in merged:
+                self.map.flush(start, end - start)
+                flushed += end - start
+            self.index.commit()
+        return {'ranges': len(merged), 'bytes': flushed}
+
+    def _flush_periodically(self, interval):
+        while not self.stopping.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print("Error flushing memory-mapped store:", e)
+
+    def stats(self):
+        with self.lock:
+            pending = sum(end - start for start, end in self.dirty)
+        stats = self.arena.stats()
+        stats.update({
+            'path': self.path,
+            'file_bytes': len(self.map),
+            'dirty_ranges': len(self.dirty),
+            'dirty_bytes': pending,
+        })
+        return stats
+
+    def close(self):
+        self.stopping.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.flush()
+        try:
+            self.arena.close()
+            self.map.close()
+        except BufferError:
+            pass  # a caller still holds a view; everything is flushed and the mapping goes when it is collected
+        self.file.close()
+        self.index.close()
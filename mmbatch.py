@@ -0,0 +1,91 @@
+from itertools import islice
+
+
+class OpError(str):
+    """Message returned by a MemoryManager operation that did not happen (missing key, overflow, ...)."""
+
+
+# Batchable operations: name -> (space, argument names in call order)
+BATCH_OPERATIONS = {
+    'allocate_memory': ('general', ('key', 'size')),
+    'release_memory': ('general', ('key',)),
+    'check_memory_bounds': ('general', ('key', 'index')),
+    'resize_memory': ('general', ('key', 'new_size')),
+    'create_buffer': ('buffer', ('key', 'size')),
+    'release_buffer': ('buffer', ('key',)),
+    'create_stack': ('stack', ('key', 'size', 'dtype')),
+    'push_stack': ('stack', ('key', 'value')),
+    'pop_stack': ('stack', ('key',)),
+    'push_stack_many': ('stack', ('key', 'values')),
+    'pop_stack_many': ('stack', ('key', 'count')),
+    'release_stack': ('stack', ('key',)),
+    'allocate_heap': ('heap', ('key', 'size', 'dtype')),
+    'release_heap': ('heap', ('key',)),
+    'get_heap_content': ('heap', ('key',)),
+    'resize_heap': ('heap', ('key', 'new_size')),
+    'fill_heap': ('heap', ('key', 'start', 'end', 'value')),
+    'read_heap': ('heap', ('key', 'start', 'end')),
+}
+
+# Operations that only read and never need a rollback snapshot
+READ_ONLY_OPERATIONS = {'check_memory_bounds', 'get_heap_content', 'read_heap'}
+
+
+def apply_operation(manager, operation, snapshots=None):
+    # Runs one {"op": name, ...args} dict; when snapshots is a dict, the key's prior state is saved first
+    name = operation.get('op') if isinstance(operation, dict) else None
+    if name not in BATCH_OPERATIONS:
+        if isinstance(operation, dict) and '_parse_error' in operation:
+            return {'op': None, 'ok': False, 'result': f"Invalid operation: {operation['_parse_error']}"}
+        return {'op': name, 'ok': False, 'result': f"Unknown operation {name}"}
+    space, argument_names = BATCH_OPERATIONS[name]
+    try:
+        arguments = [operation.get(argument) for argument in argument_names]
+        if snapshots is not None and name not in READ_ONLY_OPERATIONS:
+            slot = (space, operation.get('key'))
+            if slot not in snapshots:
+                snapshots[slot] = manager.snapshot_key(space, operation.get('key'))
+        result = getattr(manager, name)(*arguments)
+    except Exception as e:
+        return {'op': name, 'ok': False, 'result': f"{type(e).__name__}: {e}"}
+    return {'op': name, 'ok': not isinstance(result, OpError), 'result': result}
+
+
+def run_batch(manager, operations, atomic=False):
+    """
+    Applies an ordered iterable of operations under one acquisition of ``manager.lock``.
+
+    Returns (results, rolled_back). With ``atomic`` the batch stops at the first failed
+    operation and every key it touched is restored from a snapshot taken just before
+    that key was first modified.
+    """
+    results = []
+    snapshots = {} if atomic else None
+    with manager.lock:
+        for operation in operations:
+            result = apply_operation(manager, operation, snapshots)
+            results.append(result)
+            if atomic and not result['ok']:
+                # Undone in reverse, so keys the batch created give their slots back before released keys return
+                for (space, key), snapshot in reversed(snapshots.items()):
+                    manager.restore_key(space, key, snapshot)
+                return results, True
+    return results, False
+
+
+def stream_batch(manager, operations, chunk_size=256):
+    """
+    Applies an iterable of operations in sub-batches of ``chunk_size``, yielding each result.
+
+    Operations are pulled from the iterable (and so read and parsed) before the lock is taken,
+    and the lock is held for one sub-batch at a time, so a slow client cannot stall other
+    requests. Each sub-batch is applied in isolation but the stream as a whole is not.
+    """
+    operations = iter(operations)
+    while True:
+        chunk = list(islice(operations, chunk_size))
+        if not chunk:
+            return
+        with manager.lock:
+            results = [apply_operation(manager, operation) for operation in chunk]
+        yield from results
@@ -0,0 +1,230 @@
+import threading
+import sqlite3
+import queue
+import json
+import time
+import uuid
+
+
+class OutboxFullError(Exception):
+    """Raised when the journal already holds max_pending unapplied entries."""
+
+
+class RateCounter:
+    # Events per second over a sliding window of one-second buckets
+    def __init__(self, window=60):
+        self.window = window
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.total = 0
+
+    def add(self, n=1):
+        second = int(time.time())
+        with self.lock:
+            self.total += n
+            self.buckets[second] = self.buckets.get(second, 0) + n
+            for old in [s for s in self.buckets if s <= second - self.window]:
+                del self.buckets[old]
+
+    def rate(self):
+        cutoff = int(time.time()) - self.window
+        with self.lock:
+            return sum(n for s, n in self.buckets.items() if s > cutoff) / float(self.window)
+
+
+class Outbox:
+    """
+    Durable local journal (SQLite in WAL mode) for writes that fan out to several stores.
+
+    ``append`` commits the record and returns as soon as it is durable. For every store in
+    ``appliers`` a dispatcher thread feeds due deliveries to worker threads, which call
+    ``applier(idempotency_key, record)``. Appliers must be idempotent: a delivery can be
+    retried after a crash or a failure that happened after the store accepted the write.
+    """
+
+    def __init__(self, path, appliers, workers_per_store=2, batch_size=100, max_pending=10000,
+                 poll_interval=0.05, retry_base=0.5, retry_max=30.0, synchronous='FULL'):
+        self.path = path
+        self.appliers = appliers
+        self.workers_per_store = workers_per_store
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.synchronous = synchronous
+        self.local = threading.local()
+        self.stopping = threading.Event()
+        self.wakeup = threading.Event()
+        self.appended = RateCounter()
+        self.applied = {store: RateCounter() for store in appliers}
+        self.retries = {store: 0 for store in appliers}
+        self.inflight = {store: set() for store in appliers}
+        self.queues = {store: queue.Queue(maxsize=batch_size * 2) for store in appliers}
+        self.lock = threading.Lock()
+        self._create_schema()
+        # Entries journaled but not yet applied everywhere; counted once here, then kept in step by
+        # append and _work instead of a COUNT(*) per append. Other processes' appends are not seen.
+        self.pending = self._connection().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        self.threads = []
+        for store in appliers:
+            self._start(self._dispatch, store)
+            for _ in range(workers_per_store):
+                self._start(self._work, store)
+
+    def _start(self, target, store):
+        thread = threading.Thread(target=target, args=(store,), daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self.local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS outbox (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL)""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS outbox_delivery (
+                seq INTEGER NOT NULL,
+                store TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                PRIMARY KEY (seq, store))""")
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_delivery_due ON outbox_delivery (store, next_attempt_at)")
+
+    def append(self, record, idempotency_key=None):
+        # Returns (idempotency key, True if newly journaled / False if the key was already accepted)
+        idempotency_key = idempotency_key or uuid.uuid4().hex
+        payload = json.dumps(record)
+        with self.lock:
+            # The slot is reserved before the insert so concurrent appends cannot overshoot the limit
+            if self.pending >= self.max_pending:
+                raise OutboxFullError(f"Outbox has {self.pending} pending entries (limit {self.max_pending})")
+            self.pending += 1
+        inserted = False
+        try:
+            inserted = self._insert(idempotency_key, payload)
+        finally:
+            if not inserted:
+                with self.lock:
+                    self.pending -= 1
+        if not inserted:
+            return idempotency_key, False
+        self.appended.add()
+        self.wakeup.set()
+        return idempotency_key, True
+
+    def _insert(self, idempotency_key, payload):
+        # One write transaction; a duplicate key inserts nothing instead of failing, so of two concurrent
+        # appends with the same key exactly one journals the record and the other reports a duplicate
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            cursor = conn.execute("""INSERT INTO outbox (idempotency_key, payload, created_at) VALUES (?, ?, ?)
+                                     ON CONFLICT (idempotency_key) DO NOTHING""", (idempotency_key, payload, now))
+            if cursor.rowcount == 0:
+                return False
+            conn.executemany("INSERT INTO outbox_delivery (seq, store, next_attempt_at) VALUES (?, ?, ?)",
+                             [(cursor.lastrowid, store, now) for store in self.appliers])
+        return True
+
+    def _dispatch(self, store):
+        conn = self._connection()
+        while not self.stopping.is_set():
+            with self.lock:
+                inflight = set(self.inflight[store])
+            rows = conn.execute(
+                """SELECT d.seq, o.idempotency_key, o.payload, d.attempts FROM outbox_delivery d
+                   JOIN outbox o ON o.seq = d.seq
+                   WHERE d.store = ? AND d.next_attempt_at <= ?
+                   ORDER BY d.next_attempt_at LIMIT ?""",
+                (store, time.time(), self.batch_size + len(inflight))).fetchall()
+            conn.commit()
+            queued = 0
+            for row in rows:
+                if row[0] in inflight:
+                    continue
+                with self.lock:
+                    self.inflight[store].add(row[0])
+                # Blocks when workers fall behind, which keeps reads from outrunning the store
+                self.queues[store].put(row)
+                queued += 1
+            if not queued:
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+
+    def _work(self, store):
+        applier = self.appliers[store]
+        conn = self._connection()
+        while not self.stopping.is_set():
+            try:
+                seq, idempotency_key, payload, attempts = self.queues[store].get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                applier(idempotency_key, json.loads(payload))
+            except Exception as e:
+                delay = min(self.retry_max, self.retry_base * (2 ** attempts))
+                with conn:
+                    conn.execute("""UPDATE outbox_delivery SET attempts = attempts + 1, next_attempt_at = ?,
+                                    last_error = ? WHERE seq = ? AND store = ?""",
+                                 (time.time() + delay, str(e), seq, store))
+                with self.lock:
+                    self.retries[store] += 1
+            else:
+                with conn:
+                    conn.execute("DELETE FROM outbox_delivery WHERE seq = ? AND store = ?", (seq, store))
+                    done = conn.execute("""DELETE FROM outbox WHERE seq = ? AND NOT EXISTS
+                                           (SELECT 1 FROM outbox_delivery WHERE seq = ?)""", (seq, seq)).rowcount
+                if done:
+                    with self.lock:
+                        self.pending -= 1
+                self.applied[store].add()
+            finally:
+                with self.lock:
+                    self.inflight[store].discard(seq)
+
+    def stats(self):
+        conn = self._connection()
+        now = time.time()
+        pending, oldest = conn.execute("SELECT COUNT(*), MIN(created_at) FROM outbox").fetchone()
+        stores = {}
+        for store in self.appliers:
+            count, store_oldest, failing = conn.execute(
+                """SELECT COUNT(*), MIN(o.created_at), SUM(d.attempts > 0) FROM outbox_delivery d
+                   JOIN outbox o ON o.seq = d.seq WHERE d.store = ?""", (store,)).fetchone()
+            stores[store] = {
+                'pending': count,
+                'lag_seconds': now - store_oldest if store_oldest else 0.0,
+                'failing': failing or 0,
+                'applied_total': self.applied[store].total,
+                'applied_per_second': self.applied[store].rate(),
+                'retries': self.retries[store],
+            }
+        conn.commit()
+        return {
+            'pending': pending,
+            'max_pending': self.max_pending,
+            'lag_seconds': now - oldest if oldest else 0.0,
+            'appended_total': self.appended.total,
+            'appended_per_second': self.appended.rate(),
+            'stores': stores,
+        }
+
+    def close(self):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout=2.0)
@@ -0,0 +1,189 @@
+import multiprocessing
+import argparse
+import random
+import threading
+import sys
+import time
+import uuid
+
+from shmstore import SharedMemoryManager
+
+# Concurrency stress check and throughput benchmark for the shared-memory MemoryManager.
+# Run: python shmbench.py --workers 1 2 4 8 --ops 20000
+
+
+def stress_worker(name, worker_id, threads, ops, result_queue):
+    # Several threads per process share one manager, as under a threaded WSGI server; file locks must
+    # not report false deadlocks between them
+    manager = SharedMemoryManager(name)
+    results = [None] * threads
+
+    def run(thread_id):
+        try:
+            results[thread_id] = stress_thread(manager, worker_id * threads + thread_id, ops)
+        except Exception as e:
+            results[thread_id] = ([], [], [f"Worker {worker_id} thread {thread_id} raised {e!r}"])
+
+    workers = [threading.Thread(target=run, args=(thread_id,)) for thread_id in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    manager.close()
+    result_queue.put(tuple(sum((list(result[part]) for result in results), []) for part in range(3)))
+
+
+def stress_thread(manager, worker_id, ops):
+    rng = random.Random(worker_id)
+    pushed, popped, errors = [], [], []
+    owned = {}
+    for i in range(ops):
+        choice = rng.random()
+        if choice < 0.4:
+            # Contended: every worker pushes unique values onto the same few stacks
+            value = [worker_id, i]
+            stack = f'shared-{i % 4}'
+            if manager.push_stack(stack, value) == f"Value pushed to stack for key {stack}":
+                pushed.append(value)
+        elif choice < 0.6:
+            value = manager.pop_stack(f'shared-{i % 4}')
+            if isinstance(value, list):
+                popped.append(value)
+        elif choice < 0.85 or not owned:
+            # Private buffers filled with a pattern that must survive other workers' allocations
+            key = f'w{worker_id}-{i}'
+            size = rng.randint(1, 4096)
+            if manager.create_buffer(key, size).startswith("Buffer created"):
+                manager.acquire_buffer_view(key)[:] = bytes([worker_id % 250 + 1]) * size
+                manager.release_buffer_view(key)
+                owned[key] = size
+        else:
+            key = rng.choice(list(owned))
+            if manager.get_buffer_content(key) != bytes([worker_id % 250 + 1]) * owned[key]:
+                errors.append(f"Buffer {key} was corrupted")
+            manager.release_buffer(key)
+            del owned[key]
+    for key, size in owned.items():
+        if manager.get_buffer_content(key) != bytes([worker_id % 250 + 1]) * size:
+            errors.append(f"Buffer {key} was corrupted")
+        manager.release_buffer(key)
+    return pushed, popped, errors
+
+
+def run_stress(workers, ops, threads=1):
+    name = f'mmstress_{uuid.uuid4().hex[:8]}'
+    manager = SharedMemoryManager(name, size=64 * 1024 * 1024, directory_slots=16384, stripes=32)
+    for i in range(4):
+        manager.create_stack(f'shared-{i}', ops * workers * threads)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=stress_worker, args=(name, w, threads, ops, results))
+                 for w in range(workers)]
+    for process in processes:
+        process.start()
+    pushed, popped, errors = [], [], []
+    for _ in processes:
+        p, q, e = results.get()
+        pushed += p
+        popped += q
+        errors += e
+    for process in processes:
+        process.join()
+
+    remaining = []
+    for i in range(4):
+        while True:
+            value = manager.pop_stack(f'shared-{i}')
+            if not isinstance(value, list):
+                break
+            remaining.append(value)
+    pushed_set = {tuple(v) for v in pushed}
+    seen = [tuple(v) for v in popped + remaining]
+    if len(seen) != len(set(seen)):
+        errors.append("A value was popped more than once")
+    if set(seen) != pushed_set:
+        errors.append(f"{len(pushed_set - set(seen))} pushed values were lost")
+    leaked = manager.get_memory_usage()['buffer_memory']
+    if leaked:
+        errors.append(f"{len(leaked)} buffers were not released")
+    manager.destroy()
+    return {'pushed': len(pushed), 'popped': len(popped), 'drained': len(remaining), 'errors': errors}
+
+
+def bench_worker(name, worker_id, ops, start, result_queue):
+    manager = SharedMemoryManager(name)
+    keys = [f'b{worker_id}-{i}' for i in range(64)]
+    stack = f'stack-{worker_id}'
+    for key in keys:
+        manager.create_buffer(key, 1024)
+    start.wait()
+    began = time.perf_counter()
+    for i in range(ops):
+        op = i % 4
+        if op == 0:
+            manager.push_stack(stack, i)
+        elif op == 1:
+            manager.pop_stack(stack)
+        elif op == 2:
+            manager.check_memory_bounds(keys[i % 64], 10)
+        else:
+            key = keys[i % 64]
+            manager.release_buffer(key)
+            manager.create_buffer(key, 1024)
+    elapsed = time.perf_counter() - began
+    manager.close()
+    result_queue.put((ops, elapsed))
+
+
+def run_benchmark(workers, ops):
+    name = f'mmbench_{uuid.uuid4().hex[:8]}'
+    manager = SharedMemoryManager(name, size=64 * 1024 * 1024)
+    for w in range(workers):
+        manager.create_stack(f'stack-{w}', ops)
+    results = multiprocessing.Queue()
+    start = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=bench_worker, args=(name, w, ops, start, results))
+                 for w in range(workers)]
+    for process in processes:
+        process.start()
+    time.sleep(0.5)
+    start.set()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    manager.destroy()
+    total_ops = sum(ops for ops, _ in totals)
+    wall = max(elapsed for _, elapsed in totals)
+    return total_ops / wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test and benchmark the shared-memory MemoryManager")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--ops', type=int, default=20000, help="operations per worker")
+    parser.add_argument('--threads', type=int, default=4, help="threads per process in the stress check")
+    parser.add_argument('--skip-stress', action='store_true')
+    args = parser.parse_args()
+
+    if not args.skip_stress:
+        workers = max(args.workers)
+        failed = False
+        for threads in sorted({1, args.threads}):
+            result = run_stress(workers, args.ops // 4 // threads, threads)
+            status = "FAILED" if result['errors'] else "ok"
+            print(f"stress ({workers} workers x {threads} threads): {status} pushed={result['pushed']} "
+                  f"popped={result['popped']} drained={result['drained']}")
+            for error in result['errors']:
+                print("  ", error)
+            failed = failed or bool(result['errors'])
+        if failed:
+            sys.exit(1)
+
+    baseline = None
+    for workers in args.workers:
+        rate = run_benchmark(workers, args.ops)
+        baseline = baseline or rate
+        print(f"{workers:3d} workers: {rate:12,.0f} ops/sec  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
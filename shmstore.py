@@ -0,0 +1,650 @@
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import threading
+import struct
+import fcntl
+import errno
+import time
+import itertools
+import weakref
+import json
+import zlib
+import os
+
+from arena import Arena
+from mmbatch import OpError
+
+# Directory segment: header (magic, stripes, slots per stripe) followed by the slots
+_DIR_HEADER = struct.Struct('<8sQQ')
+_DIR_MAGIC = b'MMSHMDIR'
+# Directory slot: state, space, key length, views held by transfers, region offset, size, extra | key bytes
+_SLOT = struct.Struct('<BBHIqqq')
+_KEY_MAX = 64
+_SLOT_SIZE = _SLOT.size + _KEY_MAX
+_EMPTY, _USED, _DELETED = 0, 1, 2
+_SPACES = {'general': 1, 'buffer': 2, 'stack': 3, 'heap': 4}
+_SPACE_NAMES = {code: name for name, code in _SPACES.items()}
+
+# Stack region: element count, used payload bytes | records of payload + u32 length
+_STACK_HEADER = struct.Struct('<qq')
+_RECORD_LENGTH = struct.Struct('<I')
+_STACK_INITIAL_BYTES = 256
+
+# struct flock for F_OFD_SETLKW (Linux layout, padded to its native size)
+_FLOCK = struct.Struct('hhqqi4x')
+
+_INIT_LOCK = 0
+_ALLOCATOR_LOCK = 1
+
+
+def _attach(name, size=None):
+    # Segments outlive any one worker, so keep the resource tracker from unlinking them at exit
+    if size is None:
+        segment = shared_memory.SharedMemory(name=name)
+    else:
+        segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    except Exception:
+        pass
+    return segment
+
+
+class StripedLock:
+    """
+    Re-entrant per-stripe lock that excludes both threads (threading.RLock) and processes (fcntl byte-range
+    lock on a lock file).
+
+    Classic POSIX record locks belong to the whole process, so with several threads per process Linux's
+    deadlock detector reports EDEADLK for waits that are not deadlocks. Open file description (OFD) locks
+    belong to the descriptor instead: a thread takes its first stripe on a descriptor from a pool and hands it
+    back once it holds none. Only a thread's outermost hold of a stripe takes and drops the file lock. Where
+    OFD locks are unavailable, process-owned locks are used and a spurious EDEADLK is retried.
+    """
+    def __init__(self, path, count):
+        self.path = path
+        self.locks = [threading.RLock() for _ in range(count)]
+        self.local = threading.local()
+        self.pool_lock = threading.Lock()
+        self.fds = []       # every descriptor opened, closed together
+        self.free_fds = []  # descriptors holding no locks
+
+    def grow(self, count):
+        self.locks.extend(threading.RLock() for _ in range(count - len(self.locks)))
+
+    def _checkout(self):
+        with self.pool_lock:
+            if self.free_fds:
+                return self.free_fds.pop()
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self.fds.append(fd)
+            return fd
+
+    def _checkin(self, fd):
+        with self.pool_lock:
+            self.free_fds.append(fd)
+
+    def _lock(self, fd, index, lock_type):
+        if hasattr(fcntl, 'F_OFD_SETLKW'):
+            # struct flock: l_type, l_whence, l_start, l_len, l_pid (must be 0 for OFD locks)
+            fcntl.fcntl(fd, fcntl.F_OFD_SETLKW, _FLOCK.pack(lock_type, os.SEEK_SET, index, 1, 0))
+            return
+        while True:
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX if lock_type == fcntl.F_WRLCK else fcntl.LOCK_UN, 1, index)
+                return
+            except OSError as e:
+                if e.errno != errno.EDEADLK:
+                    raise
+                time.sleep(0.001)
+
+    @contextmanager
+    def hold(self, index):
+        local = self.local.__dict__
+        depths = local.setdefault('depths', {})
+        with self.locks[index]:
+            depth = depths.get(index, 0)
+            if not depth:
+                if not local.get('held'):
+                    local['fd'] = self._checkout()
+                local['held'] = local.get('held', 0) + 1
+                try:
+                    self._lock(local['fd'], index, fcntl.F_WRLCK)
+                except BaseException:
+                    self._drop(local)
+                    raise
+            depths[index] = depth + 1
+            try:
+                yield
+            finally:
+                depths[index] = depth
+                if not depth:
+                    try:
+                        self._lock(local['fd'], index, fcntl.F_UNLCK)
+                    finally:
+                        self._drop(local)
+
+    def _drop(self, local):
+        local['held'] -= 1
+        if not local['held']:
+            self._checkin(local.pop('fd'))
+
+    @contextmanager
+    def hold_all(self, indexes):
+        # Acquired in ascending order, the same order any single operation uses
+        held = []
+        try:
+            for index in sorted(indexes):
+                context = self.hold(index)
+                context.__enter__()
+                held.append(context)
+            yield
+        finally:
+            for context in reversed(held):
+                context.__exit__(None, None, None)
+
+    def close(self):
+        with self.pool_lock:
+            for fd in self.fds:
+                os.close(fd)
+            self.fds, self.free_fds = [], []
+
+
+class SharedMemoryManager:
+    """
+    MemoryManager whose regions, stacks and key directory live in POSIX shared memory, so
+    every worker process attached to ``name`` sees one store.
+
+    The directory is an open-addressing table split into ``stripes``; a key hashes to one
+    stripe and is only probed there, so operations on keys in different stripes run in
+    parallel. Region allocation goes through the shared arena under its own lock, always
+    taken after a stripe lock. Public methods mirror MemoryManager and return the same messages.
+    """
+
+    def __init__(self, name='memory_manager', size=256 * 1024 * 1024, directory_slots=65536, stripes=64,
+                 min_block=64, lock_dir='/tmp'):
+        self.name = name
+        self.locks = StripedLock(os.path.join(lock_dir, f'{name}.lock'), 1)
+        with self.locks.hold(_INIT_LOCK):
+            try:
+                self.data = _attach(f'{name}_data')
+                self.directory = _attach(f'{name}_dir')
+                self.arena = Arena(self.data.buf, initialize=False)
+            except FileNotFoundError:
+                slots_per_stripe = directory_slots // stripes
+                self.data = _attach(f'{name}_data', size)
+                self.directory = _attach(f'{name}_dir', _DIR_HEADER.size + slots_per_stripe * stripes * _SLOT_SIZE)
+                self.directory.buf[:] = bytes(len(self.directory.buf))
+                _DIR_HEADER.pack_into(self.directory.buf, 0, _DIR_MAGIC, stripes, slots_per_stripe)
+                self.arena = Arena(self.data.buf, min_block=min_block)
+        # The layout chosen by the creating process wins over this process's arguments
+        magic, self.stripes, self.slots_per_stripe = _DIR_HEADER.unpack_from(self.directory.buf, 0)
+        if magic != _DIR_MAGIC:
+            raise ValueError(f"Shared memory segment {name}_dir is not a memory manager directory")
+        self.locks.grow(self.stripes + 2)
+        # Views handed out by acquire_buffer_view that are still referenced (writable views cannot be hashed)
+        self.leases = weakref.WeakValueDictionary()
+        self.lease_ids = itertools.count()
+        self.dir = self.directory.buf[_DIR_HEADER.size:]
+
+    # Directory helpers (callers hold the key's stripe lock)
+    def _encode(self, key):
+        encoded = json.dumps(key).encode('utf-8')
+        if len(encoded) > _KEY_MAX:
+            raise ValueError(f"Key {key} is longer than {_KEY_MAX} bytes")
+        return encoded
+
+    def _stripe(self, space, encoded):
+        return zlib.crc32(encoded, _SPACES[space]) % self.stripes
+
+    def _home(self, space, encoded):
+        # Home slot within the stripe from the hash bits above those that chose the stripe. A second crc32
+        # of the same key is linearly related to the first, which left most home slots unused.
+        return zlib.crc32(encoded, _SPACES[space]) // self.stripes % self.slots_per_stripe
+
+    def _find(self, space, encoded, stripe):
+        # Returns (slot index or None, first reusable slot index or None)
+        code = _SPACES[space]
+        base = stripe * self.slots_per_stripe
+        start = self._home(space, encoded)
+        reusable = None
+        for probe in range(self.slots_per_stripe):
+            index = base + (start + probe) % self.slots_per_stripe
+            state, slot_space, key_length, _, _, _, _ = _SLOT.unpack_from(self.dir, index * _SLOT_SIZE)
+            if state == _EMPTY:
+                return None, reusable if reusable is not None else index
+            if state == _DELETED:
+                if reusable is None:
+                    reusable = index
+                continue
+            key_start = index * _SLOT_SIZE + _SLOT.size
+            if slot_space == code and bytes(self.dir[key_start:key_start + key_length]) == encoded:
+                return index, reusable
+        return None, reusable
+
+    def _read(self, index):
+        _, _, _, _, offset, size, extra = _SLOT.unpack_from(self.dir, index * _SLOT_SIZE)
+        return offset, size, extra
+
+    def _write(self, index, space, encoded, offset, size, extra):
+        _SLOT.pack_into(self.dir, index * _SLOT_SIZE, _USED, _SPACES[space], len(encoded), 0, offset, size, extra)
+        key_start = index * _SLOT_SIZE + _SLOT.size
+        self.dir[key_start:key_start + len(encoded)] = encoded
+
+    def _update(self, index, offset, size, extra):
+        state, space, key_length, views, _, _, _ = _SLOT.unpack_from(self.dir, index * _SLOT_SIZE)
+        _SLOT.pack_into(self.dir, index * _SLOT_SIZE, state, space, key_length, views, offset, size, extra)
+
+    def _views(self, index):
+        return _SLOT.unpack_from(self.dir, index * _SLOT_SIZE)[3]
+
+    def _set_views(self, index, views):
+        state, space, key_length, _, offset, size, extra = _SLOT.unpack_from(self.dir, index * _SLOT_SIZE)
+        _SLOT.pack_into(self.dir, index * _SLOT_SIZE, state, space, key_length, views, offset, size, extra)
+
+    def _delete(self, index):
+        _SLOT.pack_into(self.dir, index * _SLOT_SIZE, _DELETED, 0, 0, 0, 0, 0, 0)
+
+    @property
+    def lock(self):
+        # Whole-store lock for batches: every directory stripe, across threads and processes
+        return self.locks.hold_all(range(2, 2 + self.stripes))
+
+    @contextmanager
+    def _locked(self, space, key):
+        encoded = self._encode(key)
+        stripe = self._stripe(space, encoded)
+        with self.locks.hold(2 + stripe):
+            yield encoded, stripe
+
+    def _allocate(self, nbytes):
+        with self.locks.hold(_ALLOCATOR_LOCK):
+            return self.arena.allocate(nbytes)
+
+    def _release(self, offset):
+        with self.locks.hold(_ALLOCATOR_LOCK):
+            self.arena.release(offset)
+
+    def _reallocate(self, offset, old_nbytes, new_nbytes):
+        with self.locks.hold(_ALLOCATOR_LOCK):
+            return self.arena.reallocate(offset, old_nbytes, new_nbytes)
+
+    # Regions (general, buffer and heap memory)
+    def _create_region(self, space, key, size, exists_message, created_message, failure_message):
+        with self._locked(space, key) as (encoded, stripe):
+            index, reusable = self._find(space, encoded, stripe)
+            if index is not None:
+                return OpError(exists_message)
+            if reusable is None:
+                return OpError(f"{failure_message}: directory stripe is full")
+            try:
+                offset = self._allocate(size)
+            except MemoryError as e:
+                return OpError(f"{failure_message}: {e}")
+            self._write(reusable, space, encoded, offset, size, 0)
+            return created_message
+
+    def _release_region(self, space, key, missing_message, released_message):
+        with self._locked(space, key) as (encoded, stripe):
+            index, _ = self._find(space, encoded, stripe)
+            if index is None:
+                return OpError(missing_message)
+            if self._views(index):
+                return OpError(f"{space.capitalize()} for key {key} is in use by {self._views(index)} transfers")
+            offset, _, _ = self._read(index)
+            self._release(offset)
+            self._delete(index)
+            return released_message
+
+    def _resize_region(self, space, key, new_size, missing_message, resized_message, failure_message):
+        with self._locked(space, key) as (encoded, stripe):
+            index, _ = self._find(space, encoded, stripe)
+            if index is None:
+                return OpError(missing_message)
+            offset, size, extra = self._read(index)
+            try:
+                offset = self._reallocate(offset, size, new_size)
+            except MemoryError as e:
+                return OpError(f"{failure_message}: {e}")
+            self._update(index, offset, new_size, extra)
+            return resized_message.format(current_size=size)
+
+    def _region_view(self, space, key):
+        # Only valid while the caller holds the key's stripe lock; another process may free the block after
+        with self._locked(space, key) as (encoded, stripe):
+            index, _ = self._find(space, encoded, stripe)
+            if index is None:
+                return None
+            offset, size, _ = self._read(index)
+            return self.arena.view(offset, size)
+
+    # General Memory Management
+    def allocate_memory(self, key, size):
+        return self._create_region('general', key, size, f"Memory already allocated for key {key}",
+                                   f"Memory allocated for key {key} with size {size}",
+                                   f"Unable to allocate memory for key {key}")
+
+    def release_memory(self, key):
+        return self._release_region('general', key, f"No memory allocated for key {key}",
+                                    f"Memory released for key {key}")
+
+    def check_memory_bounds(self, key, index):
+        with self._locked('general', key) as (encoded, stripe):
+            slot, _ = self._find('general', encoded, stripe)
+            if slot is None:
+                return OpError(f"No memory allocated for key {key}")
+            _, size, _ = self._read(slot)
+        if index < 0 or index >= size:
+            return f"Index {index} is out of bounds for key {key} with size {size}"
+        return f"Index {index} is within bounds for key {key}"
+
+    def resize_memory(self, key, new_size):
+        return self._resize_region('general', key, new_size, f"No memory allocated for key {key}",
+                                   f"Memory for key {key} resized from {{current_size}} to {new_size}",
+                                   f"Unable to resize memory for key {key}")
+
+    # Buffer Memory Management
+    def create_buffer(self, key, size):
+        return self._create_region('buffer', key, size, f"Buffer already exists for key {key}",
+                                   f"Buffer created for key {key} with size {size}",
+                                   f"Unable to create buffer for key {key}")
+
+    def release_buffer(self, key):
+        return self._release_region('buffer', key, f"No buffer exists for key {key}",
+                                    f"Buffer released for key {key}")
+
+    def _region_bytes(self, space, key):
+        # Copy of the region taken under its stripe lock, so it cannot be torn by a concurrent release
+        with self._locked(space, key):
+            view = self._region_view(space, key)
+            return None if view is None else bytes(view)
+
+    def acquire_buffer_view(self, key):
+        # The count lives in the directory slot, so a release from any process is refused until the
+        # transfer calls release_buffer_view. A worker killed mid-transfer leaves the buffer held.
+        with self._locked('buffer', key) as (encoded, stripe):
+            index, _ = self._find('buffer', encoded, stripe)
+            if index is None:
+                return OpError(f"No buffer exists for key {key}")
+            self._set_views(index, self._views(index) + 1)
+            offset, size, _ = self._read(index)
+            view = self.arena.view(offset, size)
+            self.leases[next(self.lease_ids)] = view
+            return view
+
+    def release_buffer_view(self, key):
+        with self._locked('buffer', key) as (encoded, stripe):
+            index, _ = self._find('buffer', encoded, stripe)
+            if index is not None and self._views(index):
+                self._set_views(index, self._views(index) - 1)
+
+    def get_buffer_content(self, key):
+        content = self._region_bytes('buffer', key)
+        return OpError(f"No buffer exists for key {key}") if content is None else content
+
+    def region_written(self, space, key, start, end):
+        pass  # shared memory has no backing file to flush
+
+    def pin_region(self, space, key):
+        # Shared memory regions are never spilled, so pinning only checks that the region exists
+        with self._locked(space, key) as (encoded, stripe):
+            index, _ = self._find(space, encoded, stripe)
+        if index is None:
+            return OpError(f"No {space} region exists for key {key}")
+        return f"Pinned {space} region for key {key}"
+
+    def unpin_region(self, space, key):
+        return f"Unpinned {space} region for key {key}"
+
+    # Stack Memory Management
+    def create_stack(self, key, size, dtype=None):
+        if dtype is not None:
+            return OpError(f"Unable to create stack for key {key}: typed stacks are not supported in shared memory")
+        with self._locked('stack', key) as (encoded, stripe):
+            index, reusable = self._find('stack', encoded, stripe)
+            if index is not None:
+                return OpError(f"Stack already exists for key {key}")
+            if reusable is None:
+                return OpError(f"Unable to create stack for key {key}: directory stripe is full")
+            try:
+                offset = self._allocate(_STACK_INITIAL_BYTES)
+            except MemoryError as e:
+                return OpError(f"Unable to create stack for key {key}: {e}")
+            _STACK_HEADER.pack_into(self.arena.mem, offset, 0, 0)
+            # size is the element limit, extra the region's byte capacity
+            self._write(reusable, 'stack', encoded, offset, size, _STACK_INITIAL_BYTES)
+            return f"Stack created for key {key} with size {size}"
+
+    def push_stack(self, key, value):
+        payload = json.dumps(value).encode('utf-8')
+        with self._locked('stack', key) as (encoded, stripe):
+            index, _ = self._find('stack', encoded, stripe)
+            if index is None:
+                return OpError(f"No stack exists for key {key}")
+            offset, size, capacity = self._read(index)
+            count, used = _STACK_HEADER.unpack_from(self.arena.mem, offset)
+            if count >= size:
+                return OpError(f"Stack overflow for key {key}")
+            needed = _STACK_HEADER.size + used + len(payload) + _RECORD_LENGTH.size
+            if needed > capacity:
+                new_capacity = max(needed, capacity * 2)
+                try:
+                    offset = self._reallocate(offset, capacity, new_capacity)
+                except MemoryError as e:
+                    return OpError(f"Unable to push to stack for key {key}: {e}")
+                capacity = new_capacity
+                self._update(index, offset, size, capacity)
+            position = offset + _STACK_HEADER.size + used
+            self.arena.mem[position:position + len(payload)] = payload
+            _RECORD_LENGTH.pack_into(self.arena.mem, position + len(payload), len(payload))
+            _STACK_HEADER.pack_into(self.arena.mem, offset, count + 1, used + len(payload) + _RECORD_LENGTH.size)
+            return f"Value pushed to stack for key {key}"
+
+    def pop_stack(self, key):
+        with self._locked('stack', key) as (encoded, stripe):
+            index, _ = self._find('stack', encoded, stripe)
+            if index is None:
+                return OpError(f"No stack exists for key {key}")
+            offset, _, _ = self._read(index)
+            count, used = _STACK_HEADER.unpack_from(self.arena.mem, offset)
+            if not count:
+                return OpError(f"Stack underflow for key {key}")
+            end = offset + _STACK_HEADER.size + used
+            length = _RECORD_LENGTH.unpack_from(self.arena.mem, end - _RECORD_LENGTH.size)[0]
+            start = end - _RECORD_LENGTH.size - length
+            value = json.loads(bytes(self.arena.mem[start:start + length]))
+            _STACK_HEADER.pack_into(self.arena.mem, offset, count - 1, used - length - _RECORD_LENGTH.size)
+            return value
+
+    def push_stack_many(self, key, values):
+        # All or nothing: every value is encoded and the total room reserved before the stack is written
+        payloads = [json.dumps(value).encode('utf-8') for value in values]
+        with self._locked('stack', key) as (encoded, stripe):
+            index, _ = self._find('stack', encoded, stripe)
+            if index is None:
+                return OpError(f"No stack exists for key {key}")
+            offset, size, capacity = self._read(index)
+            count, used = _STACK_HEADER.unpack_from(self.arena.mem, offset)
+            if count + len(payloads) > size:
+                return OpError(f"Stack overflow for key {key}: {len(payloads)} values do not fit in "
+                               f"{size - count} free slots")
+            added = sum(len(payload) for payload in payloads) + _RECORD_LENGTH.size * len(payloads)
+            needed = _STACK_HEADER.size + used + added
+            if needed > capacity:
+                new_capacity = max(needed, capacity * 2)
+                try:
+                    offset = self._reallocate(offset, capacity, new_capacity)
+                except MemoryError as e:
+                    return OpError(f"Unable to push to stack for key {key}: {e}")
+                capacity = new_capacity
+                self._update(index, offset, size, capacity)
+            position = offset + _STACK_HEADER.size + used
+            for payload in payloads:
+                self.arena.mem[position:position + len(payload)] = payload
+                _RECORD_LENGTH.pack_into(self.arena.mem, position + len(payload), len(payload))
+                position += len(payload) + _RECORD_LENGTH.size
+            _STACK_HEADER.pack_into(self.arena.mem, offset, count + len(payloads), used + added)
+            return f"{len(payloads)} values pushed to stack for key {key}"
+
+    def pop_stack_many(self, key, count):
+        with self._locked('stack', key) as (encoded, stripe):
+            index, _ = self._find('stack', encoded, stripe)
+            if index is None:
+                return OpError(f"No stack exists for key {key}")
+            available, _ = _STACK_HEADER.unpack_from(self.arena.mem, self._read(index)[0])
+            if count < 0 or count > available:
+                return OpError(f"Stack underflow for key {key}: {count} values requested, {available} available")
+            return [self.pop_stack(key) for _ in range(count)]
+
+    def release_stack(self, key):
+        return self._release_region('stack', key, f"No stack exists for key {key}",
+                                    f"Stack released for key {key}")
+
+    # Heap Memory Management
+    def allocate_heap(self, key, size, dtype=None):
+        if dtype is not None:
+            return OpError(f"Unable to allocate heap memory for key {key}: typed heaps are not supported in shared memory")
+        return self._create_region('heap', key, size, f"Heap memory already allocated for key {key}",
+                                   f"Heap memory allocated for key {key} with size {size}",
+                                   f"Unable to allocate heap memory for key {key}")
+
+    def release_heap(self, key):
+        return self._release_region('heap', key, f"No heap memory allocated for key {key}",
+                                    f"Heap memory released for key {key}")
+
+    def get_heap_content(self, key):
+        content = self._region_bytes('heap', key)
+        return OpError(f"No heap memory allocated for key {key}") if content is None else list(content)
+
+    def resize_heap(self, key, new_size):
+        return self._resize_region('heap', key, new_size, f"No heap memory allocated for key {key}",
+                                   f"Heap memory for key {key} resized from {{current_size}} to {new_size}",
+                                   f"Unable to resize heap memory for key {key}")
+
+    def fill_heap(self, key, start, end, value):
+        with self._locked('heap', key):
+            view = self._region_view('heap', key)
+            if view is None:
+                return OpError(f"No heap memory allocated for key {key}")
+            end = len(view) if end is None else end
+            if not 0 <= start <= end <= len(view):
+                return OpError(f"Range {start}:{end} is out of bounds for key {key} with size {len(view)}")
+            try:
+                view[start:end] = bytes([value]) * (end - start)
+            except (TypeError, ValueError) as e:
+                return OpError(f"Unable to fill heap memory for key {key}: {e}")
+            return f"Filled {end - start} slots of heap memory for key {key}"
+
+    def read_heap(self, key, start, end=None):
+        with self._locked('heap', key):
+            view = self._region_view('heap', key)
+            if view is None:
+                return OpError(f"No heap memory allocated for key {key}")
+            end = len(view) if end is None else end
+            if not 0 <= start <= end <= len(view):
+                return OpError(f"Range {start}:{end} is out of bounds for key {key} with size {len(view)}")
+            return view[start:end].tolist()
+
+    # Get memory usage summary
+    def get_memory_usage(self):
+        usage = {'general_memory': {}, 'buffer_memory': {}, 'stack_memory': {}, 'heap_memory': {}}
+        requested = 0
+        for stripe in range(self.stripes):
+            with self.locks.hold(2 + stripe):
+                base = stripe * self.slots_per_stripe
+                for index in range(base, base + self.slots_per_stripe):
+                    state, space, key_length, _, offset, size, extra = _SLOT.unpack_from(self.dir, index * _SLOT_SIZE)
+                    if state != _USED:
+                        continue
+                    key_start = index * _SLOT_SIZE + _SLOT.size
+                    key = json.loads(bytes(self.dir[key_start:key_start + key_length]))
+                    if _SPACE_NAMES[space] == 'stack':
+                        usage['stack_memory'][key] = _STACK_HEADER.unpack_from(self.arena.mem, offset)[0]
+                        requested += extra
+                    else:
+                        usage[f'{_SPACE_NAMES[space]}_memory'][key] = size
+                        requested += size
+        with self.locks.hold(_ALLOCATOR_LOCK):
+            stats = self.arena.stats()
+        stats['requested_bytes'] = requested
+        stats['internal_fragmentation'] = 1.0 - requested / float(stats['allocated_bytes']) if stats['allocated_bytes'] else 0.0
+        stats['worker_pid'] = os.getpid()
+        usage['bytes'] = stats
+        return usage
+
+    # Batch rollback support
+    def snapshot_key(self, space, key):
+        with self._locked(space, key) as (encoded, stripe):
+            index, _ = self._find(space, encoded, stripe)
+            if index is None:
+                return None
+            offset, size, extra = self._read(index)
+            nbytes = extra if space == 'stack' else size
+            return {'size': size, 'extra': extra, 'data': bytes(self.arena.mem[offset:offset + nbytes])}
+
+    def restore_key(self, space, key, snapshot):
+        # The key's current slot is reused, so restoring never needs a free slot unless the batch created
+        # the key; the new block is taken before the old one is freed unless memory is too tight for both
+        with self._locked(space, key) as (encoded, stripe):
+            index, reusable = self._find(space, encoded, stripe)
+            if index is not None and snapshot is not None and self._views(index):
+                # Another process is transferring through this buffer, so restore it in place
+                offset, _, _ = self._read(index)
+                self.arena.mem[offset:offset + len(snapshot['data'])] = snapshot['data']
+                return
+            if snapshot is None:
+                if index is not None:
+                    self._release(self._read(index)[0])
+                    self._delete(index)
+                return
+            slot = index if index is not None else reusable
+            if slot is None:
+                return OpError(f"Unable to restore {space} for key {key}: directory stripe is full")
+            old_offset = self._read(index)[0] if index is not None else None
+            data = snapshot['data']
+            try:
+                offset = self._allocate(len(data))
+            except MemoryError as e:
+                if old_offset is None:
+                    return OpError(f"Unable to restore {space} for key {key}: {e}")
+                self._release(old_offset)
+                old_offset = None
+                try:
+                    offset = self._allocate(len(data))
+                except MemoryError as e:
+                    self._delete(index)
+                    return OpError(f"Unable to restore {space} for key {key}: {e}")
+            if old_offset is not None:
+                self._release(old_offset)
+            self.arena.mem[offset:offset + len(data)] = data
+            self._write(slot, space, encoded, offset, snapshot['size'], snapshot['extra'])
+
+    def flush(self):
+        return "Nothing to flush: shared memory is not backed by a file"
+
+    def close(self):
+        # Views still leased to transfers would keep the segments from closing
+        for view in list(self.leases.values()):
+            view.release()
+        self.arena.close()
+        self.dir.release()
+        self.data.close()
+        self.directory.close()
+        self.locks.close()
+
+    def destroy(self):
+        # Remove the segments; attached processes keep their mappings until they close
+        self.close()
+        for segment in (self.data, self.directory):
+            try:
+                # unlink() unregisters the segment again, so undo the unregister done in _attach first
+                from multiprocessing import resource_tracker
+                resource_tracker.register(segment._name, 'shared_memory')
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        try:
+            os.unlink(self.locks.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,150 @@
+from collections import OrderedDict
+import threading
+import glob
+import time
+import uuid
+import zlib
+import os
+
+
+class TimingStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000.0 if self.count else None,
+            'max_ms': self.max * 1000.0,
+        }
+
+
+class SpillStore:
+    """
+    Byte budget, LRU order and compressed spill files for MemoryManager regions.
+
+    The manager charges every resident region with its byte size and touches it on access.
+    ``victims`` lists unpinned regions from least recently used; the manager serializes
+    them one at a time until the budget holds again, ``spill`` compresses each payload to
+    a file and ``fault`` reads it back on the next access.
+    """
+
+    def __init__(self, max_bytes, directory, compression_level=1):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.compression_level = compression_level
+        os.makedirs(directory, exist_ok=True)
+        for stale in glob.glob(os.path.join(directory, '*.spill')):
+            self._remove(stale)  # spill files only mean something to the process that wrote them
+        self.lock = threading.Lock()
+        self.resident = OrderedDict()  # (space, key) -> bytes, least recently used first
+        self.used = 0
+        self.pins = {}
+        self.spilled_files = {}  # (space, key) -> (path, compressed bytes)
+        self.evictions = 0
+        self.spill_stats = TimingStats()
+        self.fault_stats = TimingStats()
+        self.spilled_bytes = 0
+
+    def charge(self, slot, nbytes):
+        with self.lock:
+            self.used += nbytes - self.resident.get(slot, 0)
+            self.resident[slot] = nbytes
+            self.resident.move_to_end(slot)
+
+    def touch(self, slot):
+        with self.lock:
+            if slot in self.resident:
+                self.resident.move_to_end(slot)
+
+    def forget(self, slot):
+        # The region was released: drop its charge, pins and spill file
+        with self.lock:
+            self.used -= self.resident.pop(slot, 0)
+            self.pins.pop(slot, None)
+            spilled = self.spilled_files.pop(slot, None)
+        if spilled is not None:
+            self._remove(spilled[0])
+
+    def over_budget(self):
+        return self.used > self.max_bytes
+
+    def victims(self, exclude=None):
+        # Least recently used unpinned regions, in eviction order
+        with self.lock:
+            candidates = [slot for slot in self.resident if slot != exclude and not self.pins.get(slot)]
+        return candidates
+
+    def pin(self, slot):
+        with self.lock:
+            self.pins[slot] = self.pins.get(slot, 0) + 1
+
+    def unpin(self, slot):
+        with self.lock:
+            if self.pins.get(slot, 0) <= 1:
+                self.pins.pop(slot, None)
+            else:
+                self.pins[slot] -= 1
+
+    def is_spilled(self, slot):
+        with self.lock:
+            return slot in self.spilled_files
+
+    def spill(self, slot, payload):
+        started = time.perf_counter()
+        compressed = zlib.compress(payload, self.compression_level)
+        path = os.path.join(self.directory, f'{uuid.uuid4().hex}.spill')
+        with open(path, 'wb') as f:
+            f.write(compressed)
+        with self.lock:
+            self.used -= self.resident.pop(slot, 0)
+            self.spilled_files[slot] = (path, len(compressed))
+            self.evictions += 1
+            self.spilled_bytes += len(payload)
+            self.spill_stats.record(time.perf_counter() - started)
+
+    def fault(self, slot):
+        started = time.perf_counter()
+        with self.lock:
+            path, _ = self.spilled_files.pop(slot)
+        with open(path, 'rb') as f:
+            payload = zlib.decompress(f.read())
+        self._remove(path)
+        with self.lock:
+            self.fault_stats.record(time.perf_counter() - started)
+        return payload
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def close(self):
+        with self.lock:
+            spilled = list(self.spilled_files.values())
+            self.spilled_files.clear()
+        for path, _ in spilled:
+            self._remove(path)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'max_bytes': self.max_bytes,
+                'used_bytes': self.used,
+                'resident_regions': len(self.resident),
+                'pinned_regions': len(self.pins),
+                'spilled_regions': len(self.spilled_files),
+                'spilled_bytes_on_disk': sum(size for _, size in self.spilled_files.values()),
+                'evictions': self.evictions,
+                'spilled_bytes_total': self.spilled_bytes,
+                'spill': self.spill_stats.summary(),
+                'fault': self.fault_stats.summary(),
+            }
@@ -0,0 +1,67 @@
+from array import array
+
+# Element types for typed stacks and heaps: NumPy-style name -> array typecode
+DTYPES = {
+    'int8': 'b',
+    'uint8': 'B',
+    'int16': 'h',
+    'uint16': 'H',
+    'int32': 'i',
+    'uint32': 'I',
+    'int64': 'q',
+    'uint64': 'Q',
+    'float32': 'f',
+    'float64': 'd',
+}
+
+
+def typecode(dtype):
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown dtype {dtype}; expected one of {', '.join(DTYPES)}")
+    return DTYPES[dtype]
+
+
+def itemsize(dtype):
+    return array(typecode(dtype)).itemsize
+
+
+def new_array(dtype, count=0):
+    # Zero-filled and unboxed: exactly count * itemsize bytes of element storage
+    return array(typecode(dtype), bytes(count * itemsize(dtype)))
+
+
+def from_bytes(dtype, payload):
+    values = array(typecode(dtype))
+    values.frombytes(payload)
+    return values
+
+
+def as_values(container, values):
+    """
+    Converts values to the element type of ``container`` (a list, typed array or byte view)
+    before anything is modified, so a bad value fails the whole call.
+
+    Raw bytes are taken as packed native-endian elements when the container is typed; a
+    NumPy array of the same dtype converts without a per-element loop.
+    """
+    if isinstance(container, array):
+        if isinstance(values, (bytes, bytearray, memoryview)):
+            converted = array(container.typecode)
+            converted.frombytes(values)
+            return converted
+        dtype = getattr(values, 'dtype', None)
+        if dtype is not None and DTYPES.get(str(dtype)) == container.typecode:
+            return as_values(container, values.tobytes())
+        return array(container.typecode, values)
+    if isinstance(container, memoryview):
+        return bytes(values)
+    return list(values)
+
+
+def repeated(container, value, count):
+    # count copies of value in the container's element type, built without a Python loop
+    return as_values(container, [value]) * count
+
+
+def to_list(values):
+    return values if isinstance(values, list) else values.tolist()
@@ -0,0 +1,435 @@
+from flask import Flask, request, jsonify, Response
+from transformers import WhisperProcessor, WhisperForConditionalGeneration
+from pydub import AudioSegment
+from bisect import bisect_left
+from collections import deque
+from itertools import islice
+import numpy as np
+import threading
+import torch
+import json
+import time
+import uuid
+import io
+import re
+
+app = Flask(__name__)
+
+SAMPLE_RATE = 16000
+
+# Streaming configuration
+stream_config = {
+    'model_name': 'openai/whisper-large',
+    'language': 'english',
+    'task': 'transcribe',
+    'min_chunk_seconds': 1.0,     # new audio needed before a stream is re-decoded
+    'max_buffer_seconds': 25.0,   # most audio decoded at once; the feature extractor cuts input at 30s
+    'max_batch_size': 8,          # streams decoded together in one generate() call
+    'batch_wait_ms': 20,          # how long the scheduler waits to fill a batch
+    'idle_timeout_seconds': 300,  # streams without audio for this long are dropped
+    'latency_window': 1000,       # per-stream latency samples kept for percentiles
+    'event_backlog': 1000,        # recent events kept per stream for polling clients; older ones are dropped
+}
+
+# Model loading (once, shared by every stream)
+device = "cuda" if torch.cuda.is_available() else "cpu"
+processor = WhisperProcessor.from_pretrained(stream_config['model_name'])
+model = WhisperForConditionalGeneration.from_pretrained(stream_config['model_name']).to(device)
+model.eval()
+forced_decoder_ids = processor.get_decoder_prompt_ids(language=stream_config['language'], task=stream_config['task'])
+
+
+def normalize_word(word):
+    # Compare words without case or punctuation so "Hello," agrees with "hello"
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def common_prefix_length(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if normalize_word(x) != normalize_word(y):
+            break
+        n += 1
+    return n
+
+
+def word_positions(words, segments, audio_length):
+    """
+    Returns (end sample of each word, (word count, end sample) at each segment boundary).
+
+    With segment timestamps a word's end is spread evenly within its segment; without them,
+    over the whole decoded audio.
+    """
+    if not segments:
+        ends = [int(np.ceil((index + 1) / float(len(words)) * audio_length)) for index in range(len(words))]
+        return ends, []
+    ends, boundaries = [], []
+    previous_end = 0
+    for segment_text, (start, end) in segments:
+        start = min(audio_length, int((start or 0.0) * SAMPLE_RATE))
+        end = audio_length if end is None else max(start, min(audio_length, int(end * SAMPLE_RATE)))
+        count = len(segment_text.split())
+        start = max(start, previous_end)
+        ends.extend(start + int(np.ceil((index + 1) / float(count) * (end - start))) for index in range(count))
+        boundaries.append((len(ends), end))
+        previous_end = end
+    return ends, boundaries
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class TranscriptionStream:
+    def __init__(self, stream_id):
+        self.stream_id = stream_id
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.audio = np.zeros(0, dtype=np.float32)  # uncommitted audio only
+        self.buffer_start = 0                        # absolute sample index of audio[0]
+        self.total_samples = 0
+        self.pending_samples = 0                     # samples received since the last decode
+        self.chunk_marks = []                        # (absolute end sample, arrival time) per chunk
+        self.previous_hypothesis = []
+        self.buffer_committed = 0                    # words of the current buffer already final
+        self.committed = []
+        self.partial = []
+        self.events = deque(maxlen=stream_config['event_backlog'])
+        self.next_seq = 0                            # seq of the next event; events[0] has seq next_seq - len(events)
+        self.closed = False                          # set once the scheduler no longer tracks the stream
+        self.latencies = deque(maxlen=stream_config['latency_window'])
+        self.finishing = False
+        self.finished = False
+        self.scheduled = False
+        self.last_activity = time.time()
+
+    def add_audio(self, samples):
+        now = time.time()
+        with self.lock:
+            if self.finishing:
+                return False
+            self.audio = np.concatenate([self.audio, samples])
+            self.total_samples += len(samples)
+            self.pending_samples += len(samples)
+            self.chunk_marks.append((self.total_samples, now))
+            self.last_activity = now
+            return True
+
+    def ready(self):
+        if self.finished or self.scheduled:
+            return False
+        if self.finishing:
+            return True
+        return self.pending_samples >= stream_config['min_chunk_seconds'] * SAMPLE_RATE
+
+    def snapshot(self):
+        # Called by the scheduler with the lock held. At most max_buffer_seconds are decoded; audio beyond
+        # that stays buffered and counts as pending, so the stream is decoded again once this one is applied
+        audio = self.audio[:int(stream_config['max_buffer_seconds'] * SAMPLE_RATE)]
+        self.scheduled = True
+        self.pending_samples = len(self.audio) - len(audio)
+        return audio, self.buffer_start, self.finishing and len(audio) == len(self.audio)
+
+    def arrival_time(self, sample_index):
+        # Arrival time of the chunk that delivered the given absolute sample
+        ends = [end for end, _ in self.chunk_marks]
+        position = min(bisect_left(ends, sample_index), len(self.chunk_marks) - 1)
+        return self.chunk_marks[position][1]
+
+    def word_latency(self, word_ends, index, emitted_at):
+        return emitted_at - self.arrival_time(self.buffer_start + word_ends[index])
+
+    def trim(self, samples, words):
+        # Drops audio whose words are all final so the next decode starts after them
+        self.audio = self.audio[samples:]
+        self.buffer_start += samples
+        self.previous_hypothesis = self.previous_hypothesis[words:]
+        self.buffer_committed -= words
+        self.chunk_marks = [mark for mark in self.chunk_marks if mark[0] > self.buffer_start] or self.chunk_marks[-1:]
+
+    def apply_hypothesis(self, text, audio_length, final, segments=()):
+        # segments: (text, (start, end) seconds) per timestamped segment of the hypothesis, when available
+        emitted_at = time.time()
+        words = [word for segment_text, _ in segments for word in segment_text.split()] if segments else text.split()
+        word_ends, boundaries = word_positions(words, segments, audio_length)
+        forced = audio_length >= stream_config['max_buffer_seconds'] * SAMPLE_RATE
+        with self.lock:
+            # LocalAgreement-2: a word is final once two consecutive decodes agree on it
+            agreed = common_prefix_length(self.previous_hypothesis, words)
+            if final or forced:
+                agreed = len(words)
+
+            new_final = []
+            for index in range(self.buffer_committed, agreed):
+                latency = self.word_latency(word_ends, index, emitted_at)
+                self.latencies.append(latency)
+                new_final.append({'word': words[index], 'latency': latency})
+            self.buffer_committed = max(self.buffer_committed, agreed)
+            self.committed.extend(item['word'] for item in new_final)
+
+            self.partial = [{'word': words[index], 'latency': self.word_latency(word_ends, index, emitted_at)}
+                            for index in range(self.buffer_committed, len(words))]
+            self.previous_hypothesis = words
+
+            # Drop the audio of the committed prefix so only the rest is re-decoded: all of it once every word is
+            # final (or the window was full), otherwise up to the end of the last segment whose words are final
+            if forced or (words and self.buffer_committed >= len(words)):
+                self.trim(audio_length, len(words))
+            else:
+                committed_segments = [boundary for boundary in boundaries if boundary[0] <= self.buffer_committed]
+                if committed_segments:
+                    self.trim(committed_segments[-1][1], committed_segments[-1][0])
+
+            event = {
+                'seq': self.next_seq,
+                'final': new_final,
+                'partial': self.partial,
+                'emitted_at': emitted_at,
+            }
+            self.events.append(event)
+            self.next_seq += 1
+            self.scheduled = False
+            if final:
+                self.finished = True
+            self.changed.notify_all()
+            return event
+
+    def _events_since(self, seq):
+        # Events older than the backlog are gone; a client that fell that far behind resumes at the oldest kept
+        skip = max(0, seq - (self.next_seq - len(self.events)))
+        return list(islice(self.events, skip, None))
+
+    def events_since(self, seq):
+        with self.lock:
+            return self._events_since(seq)
+
+    def wait_for_events(self, seq, timeout):
+        with self.changed:
+            if self.next_seq <= seq and not self.finished and not self.closed:
+                self.changed.wait(timeout)
+            return self._events_since(seq)
+
+    def close(self):
+        # Wakes waiting event clients so they can see the stream is gone
+        with self.changed:
+            self.closed = True
+            self.changed.notify_all()
+
+    def transcript(self):
+        with self.lock:
+            return ' '.join(self.committed), ' '.join(item['word'] for item in self.partial)
+
+    def latency_stats(self):
+        with self.lock:
+            values = list(self.latencies)
+        return {
+            'count': len(values),
+            'mean': sum(values) / len(values) if values else None,
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+        }
+
+
+class BatchScheduler:
+    """Single decode thread that batches ready streams into one generate() call."""
+
+    def __init__(self):
+        self.streams = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.batches = 0
+        self.decoded_streams = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def open_stream(self):
+        stream = TranscriptionStream(uuid.uuid4().hex)
+        with self.lock:
+            self.streams[stream.stream_id] = stream
+        return stream
+
+    def get_stream(self, stream_id):
+        with self.lock:
+            return self.streams.get(stream_id)
+
+    def close_stream(self, stream_id):
+        with self.lock:
+            stream = self.streams.pop(stream_id, None)
+        if stream is not None:
+            stream.close()
+        return stream
+
+    def notify(self):
+        with self.wakeup:
+            self.wakeup.notify()
+
+    def collect_batch(self):
+        batch = []
+        with self.lock:
+            for stream in list(self.streams.values()):
+                if len(batch) >= stream_config['max_batch_size']:
+                    break
+                with stream.lock:
+                    if stream.ready():
+                        batch.append((stream,) + stream.snapshot())
+        return batch
+
+    def drop_idle_streams(self):
+        cutoff = time.time() - stream_config['idle_timeout_seconds']
+        with self.lock:
+            idle = [stream for stream in self.streams.values() if stream.last_activity < cutoff]
+            for stream in idle:
+                del self.streams[stream.stream_id]
+        for stream in idle:
+            stream.close()
+
+    def run(self):
+        while True:
+            with self.wakeup:
+                self.wakeup.wait(timeout=1.0)
+            # Give other streams a moment to become ready so they share the batch
+            time.sleep(stream_config['batch_wait_ms'] / 1000.0)
+            batch = self.collect_batch()
+            while batch:
+                self.decode(batch)
+                batch = self.collect_batch()
+            self.drop_idle_streams()
+
+    def decode(self, batch):
+        # A stream finishing with no buffered audio has nothing left to decode
+        for stream, audio, _, final in batch:
+            if not len(audio):
+                stream.apply_hypothesis('', 0, final)
+        batch = [item for item in batch if len(item[1])]
+        if not batch:
+            return
+        audios = [audio for _, audio, _, _ in batch]
+        try:
+            features = processor(audios, sampling_rate=SAMPLE_RATE, return_tensors="pt").input_features.to(device)
+            with torch.no_grad():
+                # Timestamps let each stream drop audio up to the last segment it has committed
+                predicted_ids = model.generate(features, forced_decoder_ids=forced_decoder_ids, return_timestamps=True)
+            decoded = processor.batch_decode(predicted_ids, skip_special_tokens=True, output_offsets=True)
+            outputs = [(item['text'], [(offset['text'], offset['timestamp']) for offset in item['offsets']])
+                       for item in decoded]
+        except Exception as e:
+            print("Error decoding batch:", e)
+            outputs = [('', [])] * len(batch)
+        self.batches += 1
+        self.decoded_streams += len(batch)
+        for (stream, audio, _, final), (text, segments) in zip(batch, outputs):
+            stream.apply_hypothesis(text.strip(), len(audio), final, segments)
+
+
+scheduler = BatchScheduler()
+
+
+def decode_audio_chunk(data, audio_format):
+    # Raw chunks are 16 kHz mono signed 16-bit little-endian PCM; anything else goes through pydub
+    if audio_format in (None, 'pcm', 's16le'):
+        return np.frombuffer(data[:len(data) - len(data) % 2], dtype='<i2').astype(np.float32) / 32768.0
+    audio = AudioSegment.from_file(io.BytesIO(data), format=audio_format)
+    audio = audio.set_frame_rate(SAMPLE_RATE).set_channels(1).set_sample_width(2)
+    return np.array(audio.get_array_of_samples(), dtype=np.float32) / 32768.0
+
+
+def stream_response(stream, events=None):
+    committed, partial = stream.transcript()
+    body = {
+        'stream_id': stream.stream_id,
+        'committed': committed,
+        'partial': partial,
+        'finished': stream.finished,
+        'latency': stream.latency_stats(),
+    }
+    if events is not None:
+        body['events'] = events
+    return body
+
+
+@app.route('/stream/start', methods=['POST'])
+def start_stream():
+    stream = scheduler.open_stream()
+    return jsonify(stream_response(stream)), 201
+
+
+@app.route('/stream/<stream_id>/audio', methods=['POST'])
+def push_audio(stream_id):
+    stream = scheduler.get_stream(stream_id)
+    if stream is None:
+        return jsonify({'error': 'Unknown stream'}), 404
+    try:
+        samples = decode_audio_chunk(request.get_data(), request.args.get('format'))
+    except Exception as e:
+        return jsonify({'error': f'Could not decode audio chunk: {e}'}), 400
+    if not stream.add_audio(samples):
+        return jsonify({'error': 'Stream is finishing'}), 409
+    scheduler.notify()
+    since = request.args.get('since', type=int)
+    events = stream.events_since(since) if since is not None else None
+    return jsonify(stream_response(stream, events)), 202
+
+
+@app.route('/stream/<stream_id>/events', methods=['GET'])
+def stream_events(stream_id):
+    stream = scheduler.get_stream(stream_id)
+    if stream is None:
+        return jsonify({'error': 'Unknown stream'}), 404
+    since = request.args.get('since', 0, type=int)
+    wait = request.args.get('wait', 0, type=float)
+
+    if request.accept_mimetypes.best == 'text/event-stream':
+        def generate(seq):
+            while True:
+                events = stream.wait_for_events(seq, timeout=15.0)
+                for event in events:
+                    yield f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+                if events:
+                    seq = events[-1]['seq'] + 1
+                # Ends once everything is delivered, or when the stream was dropped as idle or closed
+                if (stream.finished or stream.closed) and not stream.events_since(seq):
+                    return
+                if not events:
+                    yield ": keep-alive\n\n"
+        return Response(generate(since), mimetype='text/event-stream')
+
+    events = stream.wait_for_events(since, wait) if wait else stream.events_since(since)
+    return jsonify(stream_response(stream, events))
+
+
+@app.route('/stream/<stream_id>/finish', methods=['POST'])
+def finish_stream(stream_id):
+    stream = scheduler.get_stream(stream_id)
+    if stream is None:
+        return jsonify({'error': 'Unknown stream'}), 404
+    with stream.lock:
+        stream.finishing = True
+    scheduler.notify()
+    with stream.changed:
+        while not stream.finished:
+            if not stream.changed.wait(timeout=60.0):
+                break
+    response = stream_response(stream)
+    scheduler.close_stream(stream_id)
+    return jsonify(response)
+
+
+@app.route('/stream/stats', methods=['GET'])
+def scheduler_stats():
+    with scheduler.lock:
+        active = len(scheduler.streams)
+    return jsonify({
+        'active_streams': active,
+        'batches': scheduler.batches,
+        'decoded_streams': scheduler.decoded_streams,
+        'mean_batch_size': scheduler.decoded_streams / scheduler.batches if scheduler.batches else None,
+    })
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5008, threaded=True)
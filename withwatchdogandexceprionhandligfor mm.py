@@ -1,8 +1,131 @@
 import logging
+import logging.handlers
+import functools
+import threading
+import bisect
+import atexit
+import random
+import queue
+import time
 from flask import jsonify
 
-# Set up logging configuration
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Logging configuration: records are queued on the request thread and formatted and written by a listener thread
+logging_config = {
+    'level': logging.INFO,
+    'format': '%(asctime)s - %(levelname)s - %(message)s',
+    'sample_rate': 1.0,     # share of INFO/DEBUG records kept; warnings and errors are always kept
+    'queue_size': 10000,    # records waiting for the listener; further records are dropped and counted
+}
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a random share of records below WARNING so busy endpoints do not flood the log."""
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.sampled_out = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread.
+
+    The stock QueueHandler renders the message before queuing it, which would put the
+    %-formatting back on the caller's thread. Records stay in this process, so they can be
+    queued as they are. A full queue drops the record instead of blocking the caller.
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.queued = 0
+        self.dropped = 0
+        self.emit_seconds = 0.0
+
+    def prepare(self, record):
+        return record
+
+    def emit(self, record):
+        started = time.perf_counter()
+        try:
+            self.queue.put_nowait(record)
+            self.queued += 1
+        except queue.Full:
+            self.dropped += 1
+        self.emit_seconds += time.perf_counter() - started
+
+
+def setup_logging(config):
+    log_queue = queue.Queue(config['queue_size'])
+    handler = DeferredQueueHandler(log_queue)
+    sampler = SamplingFilter(config['sample_rate'])
+    handler.addFilter(sampler)
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter(config['format']))
+    listener = logging.handlers.QueueListener(log_queue, output)
+    root = logging.getLogger()
+    root.setLevel(config['level'])
+    root.addHandler(handler)
+    listener.start()
+    atexit.register(listener.stop)  # drains the queue on shutdown
+    return handler, sampler
+
+
+log_handler, log_sampler = setup_logging(logging_config)
+
+
+class LatencyHistogram:
+    """Operation latencies in power-of-two microsecond buckets (1us up to ~1s, then overflow)."""
+    BOUNDS_US = [2 ** i for i in range(21)]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = [0] * (len(self.BOUNDS_US) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = seconds * 1e6
+        index = bisect.bisect_left(self.BOUNDS_US, micros)
+        with self.lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.total += micros
+            if micros > self.max:
+                self.max = micros
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank
+        rank = fraction * self.count
+        seen = 0
+        for index, hits in enumerate(self.buckets):
+            seen += hits
+            if hits and seen >= rank:
+                return self.BOUNDS_US[index] if index < len(self.BOUNDS_US) else self.max
+        return None
+
+    def summary(self):
+        with self.lock:
+            return {
+                'count': self.count,
+                'mean_us': self.total / self.count if self.count else None,
+                'p50_us': self.percentile(0.5),
+                'p99_us': self.percentile(0.99),
+                'max_us': self.max,
+                'buckets_us': {f'<={bound}': hits for bound, hits in zip(self.BOUNDS_US, self.buckets) if hits},
+                'overflow': self.buckets[-1],
+            }
+
+
+# Per-operation latency histograms and error counts, filled by @traced and served from /stats
+operation_latency = {}
+operation_errors = {}
+errors_lock = threading.Lock()
 
 
 class UnderflowError(Exception):
@@ -12,18 +135,49 @@ class UnderflowError(Exception):
         super().__init__(self.message)
 
 
+def count_error(operation, error):
+    name = f'{operation}:{type(error).__name__}'
+    with errors_lock:
+        operation_errors[name] = operation_errors.get(name, 0) + 1
+
+
+def traced(func):
+    """
+    A decorator recording the latency of a MemoryManager operation and counting its errors.
+
+    Exceptions propagate to the endpoint's exception_handler, which reports them once.
+
+    :param func: The method to wrap.
+    :return: Wrapped method.
+    """
+    histogram = operation_latency.setdefault(func.__name__, LatencyHistogram())
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            count_error(func.__name__, e)
+            raise
+        finally:
+            histogram.record(time.perf_counter() - started)
+    return wrapper
+
+
 def exception_handler(func):
     """
     A decorator to handle exceptions in a standardized way.
-    
+
     :param func: The function to wrap.
     :return: Wrapped function with exception handling.
     """
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
         except Exception as e:
-            logging.error(f"An error occurred: {e}")
+            logging.error("An error occurred in %s: %s", func.__name__, e)
             return jsonify({'error': str(e), 'message': 'An unexpected error occurred.'}), 500
     return wrapper
 
@@ -36,23 +190,23 @@ class MemoryManager:
         self.stack_memory = {}
         self.heap_memory = {}
 
-    @exception_handler
+    @traced
     def allocate_memory(self, key, size):
         if key in self.memory_storage:
             raise ValueError(f"Memory already allocated for key {key}")
         self.memory_storage[key] = {'size': size, 'data': [None] * size}
-        logging.info(f'Memory allocated for key {key} with size {size}')
+        logging.info('Memory allocated for key %s with size %s', key, size)
         return f"Memory allocated for key {key} with size {size}"
 
-    @exception_handler
+    @traced
     def release_memory(self, key):
         if key not in self.memory_storage:
             raise KeyError(f"No memory allocated for key {key}")
         del self.memory_storage[key]
-        logging.info(f'Memory released for key {key}')
+        logging.info('Memory released for key %s', key)
         return f"Memory released for key {key}"
 
-    @exception_handler
+    @traced
     def check_memory_bounds(self, key, index):
         if key not in self.memory_storage:
             raise KeyError(f"No memory allocated for key {key}")
@@ -60,57 +214,57 @@ class MemoryManager:
             raise IndexError(f"Index {index} is out of bounds for key {key}")
         return f"Index {index} is within bounds for key {key}"
 
-    @exception_handler
+    @traced
     def resize_memory(self, key, new_size):
         if key not in self.memory_storage:
             raise KeyError(f"No memory allocated for key {key}")
         current_size = self.memory_storage[key]['size']
         self.memory_storage[key]['data'].extend([None] * (new_size - current_size))
         self.memory_storage[key]['size'] = new_size
-        logging.info(f'Memory for key {key} resized from {current_size} to {new_size}')
+        logging.info('Memory for key %s resized from %s to %s', key, current_size, new_size)
         return f"Memory for key {key} resized from {current_size} to {new_size}"
 
-    @exception_handler
+    @traced
     def create_buffer(self, key, size):
         if key in self.buffer_memory:
             raise ValueError(f"Buffer already exists for key {key}")
         self.buffer_memory[key] = {'size': size, 'data': bytearray(size)}
-        logging.info(f'Buffer created for key {key} with size {size}')
+        logging.info('Buffer created for key %s with size %s', key, size)
         return f"Buffer created for key {key} with size {size}"
 
-    @exception_handler
+    @traced
     def release_buffer(self, key):
         if key not in self.buffer_memory:
             raise KeyError(f"No buffer exists for key {key}")
         del self.buffer_memory[key]
-        logging.info(f'Buffer released for key {key}')
+        logging.info('Buffer released for key %s', key)
         return f"Buffer released for key {key}"
 
-    @exception_handler
+    @traced
     def get_buffer_content(self, key):
         if key not in self.buffer_memory:
             raise KeyError(f"No buffer exists for key {key}")
         return self.buffer_memory[key]['data']
 
-    @exception_handler
+    @traced
     def create_stack(self, key, size):
         if key in self.stack_memory:
             raise ValueError(f"Stack already exists for key {key}")
         self.stack_memory[key] = {'size': size, 'stack': []}
-        logging.info(f'Stack created for key {key} with size {size}')
+        logging.info('Stack created for key %s with size %s', key, size)
         return f"Stack created for key {key} with size {size}"
 
-    @exception_handler
+    @traced
     def push_stack(self, key, value):
         if key not in self.stack_memory:
             raise KeyError(f"No stack exists for key {key}")
         if len(self.stack_memory[key]['stack']) >= self.stack_memory[key]['size']:
             raise OverflowError(f"Stack overflow for key {key}")
         self.stack_memory[key]['stack'].append(value)
-        logging.info(f'Value pushed to stack for key {key}')
+        logging.info('Value pushed to stack for key %s', key)
         return f"Value pushed to stack for key {key}"
 
-    @exception_handler
+    @traced
     def pop_stack(self, key):
         if key not in self.stack_memory:
             raise KeyError(f"No stack exists for key {key}")
@@ -118,44 +272,44 @@ class MemoryManager:
             raise UnderflowError(f"Stack underflow for key {key}")
         return self.stack_memory[key]['stack'].pop()
 
-    @exception_handler
+    @traced
     def release_stack(self, key):
         if key not in self.stack_memory:
             raise KeyError(f"No stack exists for key {key}")
         del self.stack_memory[key]
-        logging.info(f'Stack released for key {key}')
+        logging.info('Stack released for key %s', key)
         return f"Stack released for key {key}"
 
-    @exception_handler
+    @traced
     def allocate_heap(self, key, size):
         if key in self.heap_memory:
             raise ValueError(f"Heap memory already allocated for key {key}")
         self.heap_memory[key] = {'size': size, 'data': [None] * size}
-        logging.info(f'Heap memory allocated for key {key} with size {size}')
+        logging.info('Heap memory allocated for key %s with size %s', key, size)
         return f"Heap memory allocated for key {key} with size {size}"
 
-    @exception_handler
+    @traced
     def release_heap(self, key):
         if key not in self.heap_memory:
             raise KeyError(f"No heap memory allocated for key {key}")
         del self.heap_memory[key]
-        logging.info(f'Heap memory released for key {key}')
+        logging.info('Heap memory released for key %s', key)
         return f"Heap memory released for key {key}"
 
-    @exception_handler
+    @traced
     def get_heap_content(self, key):
         if key not in self.heap_memory:
             raise KeyError(f"No heap memory allocated for key {key}")
         return self.heap_memory[key]['data']
 
-    @exception_handler
+    @traced
     def resize_heap(self, key, new_size):
         if key not in self.heap_memory:
             raise KeyError(f"No heap memory allocated for key {key}")
         current_size = self.heap_memory[key]['size']
         self.heap_memory[key]['data'].extend([None] * (new_size - current_size))
         self.heap_memory[key]['size'] = new_size
-        logging.info(f'Heap memory for key {key} resized from {current_size} to {new_size}')
+        logging.info('Heap memory for key %s resized from %s to %s', key, current_size, new_size)
         return f"Heap memory for key {key} resized from {current_size} to {new_size}"
 
     def get_memory_usage(self):
@@ -289,6 +443,25 @@ def resize_heap_endpoint():
     response = memory_manager.resize_heap(key, new_size)
     return jsonify({'message': response})
 
+# Endpoint for per-operation latency, error counts and logging overhead
+@app.route('/stats', methods=['GET'])
+@exception_handler
+def stats_endpoint():
+    with errors_lock:
+        errors = dict(operation_errors)
+    return jsonify({
+        'operations': {name: histogram.summary() for name, histogram in operation_latency.items()},
+        'errors': errors,
+        'logging': {
+            'queued': log_handler.queued,
+            'dropped': log_handler.dropped,
+            'sampled_out': log_sampler.sampled_out,
+            'sample_rate': log_sampler.rate,
+            'pending': log_handler.queue.qsize(),
+            'emit_mean_us': log_handler.emit_seconds / log_handler.queued * 1e6 if log_handler.queued else None,
+        },
+    })
+
 # Endpoint for getting memory usage
 @app.route('/memory_usage', methods=['GET'])
 @exception_handler